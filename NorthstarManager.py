@@ -1,15 +1,35 @@
+import atexit
+import ctypes
+import ctypes.util
+import fnmatch
+import glob
+import hashlib
+import hmac
+import http.server
+import io
 import json
 import logging
+import mmap
 import os
+import queue
+import random
 import re
+import select
 import shutil
+import sqlite3
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import zipfile
-from datetime import datetime
-from pathlib import Path
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlparse
 
 import confuse
 import psutil
@@ -18,7 +38,8 @@ import ruamel.yaml
 from confuse import ConfigTypeError
 from github import Github
 from github.GitRelease import GitRelease
-from github.GithubException import RateLimitExceededException, BadCredentialsException, UnknownObjectException
+from github.GithubException import GithubException, RateLimitExceededException, BadCredentialsException, \
+    UnknownObjectException
 from requests import ConnectionError
 from ruamel.yaml.constructor import DuplicateKeyError
 from ruamel.yaml.parser import ParserError
@@ -28,14 +49,59 @@ from tqdm import tqdm
 # =============
 # Logging setup
 # =============
+class TargetFormatter(logging.Formatter):
+    # renders the yamlpath of a TargetLogger only when the record gets emitted
+    def format(self, record):
+        record.target = "".join(f"[{part}] " for part in getattr(record, "yamlpath", ()))
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "target": "/".join(getattr(record, "yamlpath", ())),
+            **({"source": record.source} if hasattr(record, "source") else {}),
+            "message": record.getMessage(),
+        })
+
+
+class TargetLogger(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        kwargs["extra"] = self.extra
+        return msg, kwargs
+
+
+class LazyQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # the message gets formatted by the handlers of the listener thread
+        return record
+
+
+def target_logger(yamlpath) -> TargetLogger:
+    return TargetLogger(logger, {"yamlpath": tuple(yamlpath)})
+
+
+def flush_logs():
+    # waits until all queued records are written, eg. before prompting for input
+    logListener.stop()
+    logListener.start()
+
+
 logger = logging.getLogger()
 streamHandler = logging.StreamHandler(sys.stdout)
-formatter = logging.Formatter(
-    f'[%(asctime)s] [%(levelname)-7s] [{Path(sys.argv[0]).name.split(".")[0]}] %(message)s', datefmt='%H:%M:%S'
+formatter = TargetFormatter(
+    f'[%(asctime)s] [%(levelname)-7s] [{Path(sys.argv[0]).name.split(".")[0]}] %(target)s%(message)s',
+    datefmt='%H:%M:%S'
 )
 streamHandler.setFormatter(formatter)
-logger.addHandler(streamHandler)
+logQueue = queue.SimpleQueue()
+logger.addHandler(LazyQueueHandler(logQueue))
 logger.setLevel(logging.DEBUG)
+logListener = QueueListener(logQueue, streamHandler, respect_handler_level=True)
+logListener.start()
+atexit.register(logListener.stop)
 
 # ================
 # Read Launch Args
@@ -43,6 +109,13 @@ logger.setLevel(logging.DEBUG)
 args = ""
 sysargs = [sysargs.lower() for sysargs in sys.argv]
 
+
+def pop_value(index) -> str:
+    # pops the value of a launch argument in its original spelling
+    value = sysargs.pop(index)
+    return next((arg for arg in sys.argv if arg.lower() == value), value)
+
+
 showHelp = False  # print help and quit
 try:
     i = sysargs.index("-help")
@@ -151,6 +224,109 @@ try:
 except ValueError:
     pass
 
+benchmarkExtract = None  # extracts the given zip with zipfile and the parallel extraction and compares the timings
+try:
+    i = sysargs.index("-benchmarkextract")
+    args += " " + sysargs.pop(i)
+    benchmarkExtract = pop_value(i)
+    args += " " + benchmarkExtract
+except (ValueError, IndexError):
+    pass
+
+rollbackTarget = None  # restores the previous version of the given repo, eg. Mods/Northstar
+try:
+    i = sysargs.index("-rollback")
+    args += " " + sysargs.pop(i)
+    rollbackTarget = pop_value(i)
+    args += " " + rollbackTarget
+except (ValueError, IndexError):
+    pass
+
+verifyFiles = False  # hashes and compares the installed files of all mods
+try:
+    i = sysargs.index("-verify")
+    args += " " + sysargs.pop(i)
+    verifyFiles = True
+except ValueError:
+    pass
+
+repairFiles = False  # verifies and re-extracts missing or modified files
+try:
+    i = sysargs.index("-repair")
+    args += " " + sysargs.pop(i)
+    repairFiles = True
+except ValueError:
+    pass
+
+fleetCoordinator = False  # resolves the releases once and serves the update plan to agents
+try:
+    i = sysargs.index("-coordinator")
+    args += " " + sysargs.pop(i)
+    fleetCoordinator = True
+except ValueError:
+    pass
+
+fleetAgent = None  # url of the coordinator which plans the updates of this agent
+try:
+    i = sysargs.index("-agent")
+    args += " " + sysargs.pop(i)
+    fleetAgent = pop_value(i).rstrip("/")
+    args += " " + fleetAgent
+except (ValueError, IndexError):
+    pass
+
+mirrorPath = None  # installs the releases of a local mirror, without any network calls
+try:
+    i = sysargs.index("-mirror")
+    args += " " + sysargs.pop(i)
+    mirrorPath = pop_value(i)
+    args += " " + mirrorPath
+except (ValueError, IndexError):
+    pass
+
+frozenInstall = False  # installs exactly the releases of the lockfile, without any API calls
+try:
+    i = sysargs.index("-frozen")
+    args += " " + sysargs.pop(i)
+    frozenInstall = True
+except ValueError:
+    pass
+
+relockTargets = False  # writes the latest release of every repo into the lockfile
+try:
+    i = sysargs.index("-relock")
+    args += " " + sysargs.pop(i)
+    relockTargets = True
+except ValueError:
+    pass
+
+exportMirror = None  # downloads the latest releases of all repos into a local mirror
+try:
+    i = sysargs.index("-exportmirror")
+    args += " " + sysargs.pop(i)
+    exportMirror = pop_value(i)
+    args += " " + exportMirror
+except (ValueError, IndexError):
+    pass
+
+launchFirst = False  # launches the game right away and updates the client in the background
+try:
+    i = sysargs.index("-launchfirst")
+    args += " " + sysargs.pop(i)
+    launchFirst = True
+except ValueError:
+    pass
+
+targetSelectors = []  # globs of the repos to check, eg. Servers/Kraber*/Mods/PlayerVote
+while "-target" in sysargs:
+    i = sysargs.index("-target")
+    args += " " + sysargs.pop(i)
+    try:
+        targetSelectors.append(pop_value(i).strip("/"))
+        args += " " + targetSelectors[-1]
+    except IndexError:
+        break
+
 launchServers = False  # launches all servers which are not disabled
 try:
     i = sysargs.index("-launchservers")
@@ -159,11 +335,19 @@ try:
 except ValueError:
     pass
 
+watchConfig = False  # keeps running and re-applies the config of servers when the config files change
+try:
+    i = sysargs.index("-watch")
+    args += " " + sysargs.pop(i)
+    watchConfig = True
+except ValueError:
+    pass
+
 # set log level from args if exists
 if len(loglevel) > 0:
     logger.setLevel(logging.getLevelName(str(loglevel[0]).upper()))
 
-logger.info(f"Launched NorthstarManager with {'no args' if len(sysargs) == 0 else f'valid arguments: {args.strip()}'}")
+logger.info("Launched NorthstarManager with %s", 'no args' if len(sysargs) == 0 else f'valid arguments: {args.strip()}')
 
 # =======================================================
 # Read 'manager_config.yaml' and setup configuration file
@@ -171,6 +355,94 @@ logger.info(f"Launched NorthstarManager with {'no args' if len(sysargs) == 0 els
 yaml = ruamel.yaml.YAML()
 yaml.indent(mapping=4, sequence=2, offset=0)
 global conf_comments
+conf_comments = None  # round-trip data, only loaded for a config that gets written
+
+
+# parsed config files are cached as JSON, unchanged files skip the YAML parser
+class ConfigCache:
+    secret_keys = ["github_token", "fleet_secret"]  # keys of 'Global' which are never written into the cache
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.changed = False
+        try:
+            with open(path) as cache:
+                self.entries = json.load(cache)
+        except (OSError, ValueError):
+            self.entries = {}
+        # caches written before all secrets were left out are parsed again
+        for key in [key for key, entry in self.entries.items() if not isinstance(entry.get("secrets"), list)]:
+            del self.entries[key]
+            self.changed = True
+
+    def load(self, file: Path):
+        stat = file.stat()
+        key = str(file.resolve())
+        entry = self.entries.get(key)
+        if entry is not None and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return self.with_secrets(file, entry)
+
+        # touched but unchanged files are recognized by their hash
+        raw = file.read_bytes()
+        sha256 = hashlib.sha256(raw).hexdigest()
+        if entry is not None and entry["sha256"] == sha256:
+            data = self.with_secrets(file, entry)
+        else:
+            data = json.loads(json.dumps(yaml.load(raw), default=str))
+            entry = {"data": json.loads(json.dumps(data)), "secrets": []}
+            if isinstance(data, dict) and isinstance(data.get("Global"), dict):
+                for secret in [secret for secret in self.secret_keys if secret in data["Global"]]:
+                    del entry["data"]["Global"][secret]
+                    entry["secrets"].append(secret)
+        entry.update(mtime=stat.st_mtime_ns, size=stat.st_size, sha256=sha256)
+        self.entries[key] = entry
+        self.changed = True
+        return data
+
+    def with_secrets(self, file: Path, entry):
+        # the secrets are read from their lines of the YAML, the rest of the file isn't parsed
+        data = json.loads(json.dumps(entry["data"]))
+        if len(entry["secrets"]) == 0:
+            return data
+        text = file.read_text()
+        for secret in entry["secrets"]:
+            line = re.search(rf"^[ \t]+{secret}[ \t]*:.*$", text, re.MULTILINE)
+            if line is None:
+                return json.loads(json.dumps(yaml.load(text), default=str))
+            value = yaml.load(line.group(0).strip())[secret]
+            data["Global"][secret] = None if value is None else str(value)
+        return data
+
+    def save(self):
+        if not self.changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".part"), "w") as cache:
+            json.dump(self.entries, cache)
+        os.replace(self.path.with_suffix(".part"), self.path)
+        self.changed = False
+
+
+config_cache = ConfigCache(Path(".NorthstarManager/config_cache.json"))
+
+
+def read_config(file: Path, strict=True):
+    # an invalid file quits the manager, unless it's not strict, eg. while watching the config
+    try:
+        return config_cache.load(file)
+
+    except ParserError as e:
+        logger.error("[Config] '%s' is invalid.%s caused a parsing error", file, e.problem_mark)
+
+    except ScannerError as e:
+        logger.error("[Config] '%s' is invalid.%s caused a mapping error", file, e.problem_mark)
+
+    except DuplicateKeyError as e:
+        logger.error("[Config] '%s' is invalid. Duplicate Key%s found", file, e.problem_mark)
+    if strict:
+        exit(1)
+    return None
+
 
 logger.info("[Config] Reading config from 'manager_config.yaml'...")
 if not Path("manager_config.yaml").exists():
@@ -183,6 +455,8 @@ if not Path("manager_config.yaml").exists():
 Global:
     github_token:  # Token for GitHub, can be acquired from: https://github.com/settings/tokens
 #    log_level: DEBUG  # Sets the log level. Can be set to CRITICAL, ERROR, WARNING, INFO, DEBUG. Default is INFO
+#    log_json: manager_log.jsonl  # Additionally writes the log as JSON lines to this file
+#    background_download_limit_kbps: 512  # Caps the download speed in KB/s while a managed server is running
 
 # Launcher - Defines the to be launched Application with optional args
 # ====================================================================
@@ -218,6 +492,7 @@ Mods:
 #    -------------------------
 #    S2speedometer:  # Name of Mod (could be anything)
 #        repository: Mysterious_Reuploads/S2speedometer  # the repo from where to grab the latest release
+#        priority: 10  # mods with a higher priority get checked first when the GitHub rate limit runs low
 
 #    How to configure a new mod (example for CustomScopeFOV) :
 #    -------------------------
@@ -231,6 +506,8 @@ Mods:
 # ====================================================
 Servers:
     enabled: true  # disables all listed servers for update checks, and they will not get launched
+#    on_running: defer  # handling of running servers: skip, defer (re-check after the other servers) or queue (wait until the server stopped)
+#    (servers can also be moved into own files, eg. Servers/Kraber 9k.yaml, with 'Include: {Servers: Servers/*.yaml}' at the top level)
 #
 #    How to install/ configure a server (you do not need to download or setup anything just configure what you want down below) (example for Kraber9k Server):
 #    -----------------------------------
@@ -267,31 +544,26 @@ Servers:
                     ns_disallowed_weapon_primary_replacement: mp_weapon_sniper
 """
     conf_comments = ruamel.yaml.load(default_conf, ruamel.yaml.RoundTripLoader)
+    conf_data = conf_comments
 else:
-    try:
-        with open("manager_config.yaml", "r") as f:
-            conf_comments = yaml.load(f)
-
-    except ParserError as e:
-        logger.error(f"[Config] 'manager_config.yaml' is invalid.{e.problem_mark} caused a parsing error")
-        exit(1)
-
-    except ScannerError as e:
-        logger.error(f"[Config] 'manager_config.yaml' is invalid.{e.problem_mark} caused a mapping error")
-        exit(1)
-
-    except DuplicateKeyError as e:
-        logger.error(f"[Config] 'manager_config.yaml' is invalid. Duplicate Key{e.problem_mark} found")
-        exit(1)
+    conf_data = read_config(Path("manager_config.yaml"))
 
 config = confuse.Configuration(Path(sys.argv[0]).name.split(".")[0], __name__)
-config.set(conf_comments)
+config_base = list(config.sources)  # sources of confuse itself, kept when the config gets reloaded
+config.set(conf_data)
 
 # set log level from config if args dont have a specified log level
 if len(loglevel) == 0:
     logger.setLevel(
         logging.getLevelName(str(config["Global"]["log_level"].get(confuse.Optional(str, default="INFO"))).upper()))
 
+# optional JSON lines log for machine consumption
+log_json = config["Global"]["log_json"].get(confuse.Optional(str, default=""))
+if len(log_json) > 0:
+    jsonHandler = logging.FileHandler(log_json, encoding="utf-8")
+    jsonHandler.setFormatter(JsonFormatter())
+    logListener.handlers = logListener.handlers + (jsonHandler,)
+
 
 # ====================
 # validates the config
@@ -334,7 +606,7 @@ def valid_min_conf() -> bool:
         return True
 
     except (TypeError, AttributeError, KeyError):
-        logger.error(f"[Config] 'manager_config.yaml' is missing the section {'/'.join([valid_keys, valid_sections])}")
+        logger.error("[Config] 'manager_config.yaml' is missing the section %s", '/'.join([valid_keys, valid_sections]))
         return False
 
 
@@ -342,27 +614,136 @@ def valid_min_conf() -> bool:
 if not valid_min_conf():
     exit(1)
 
+
+# =======================================================
+# Include files of a section, eg. one file for every server
+# =======================================================
+def read_includes(section, strict=True) -> dict:
+    # the merged include files of one section
+    if not config["Include"][section].exists():
+        return {}
+    patterns = config["Include"][section].get()
+    patterns = [patterns] if isinstance(patterns, str) else list(patterns or [])
+    files = sorted({Path(file) for pattern in patterns for file in glob.glob(pattern)})
+    merged = {}
+    for file in files:
+        data = read_config(file, strict)
+        if not isinstance(data, dict):
+            logger.warning("[Config] '%s' is empty or not a mapping, skipping it", file)
+            continue
+        merged.update(data)
+    logger.debug("[Config] Included %s files into %s", len(files), section)
+    return merged
+
+
+included = set()  # sections whose include files are part of the config
+
+
+def load_includes(sections, strict=True):
+    for section in [s for s in config["Include"].keys() if s in sections] if config["Include"].exists() else []:
+        merged = read_includes(section, strict)
+        if len(merged) > 0:
+            config.set({section: merged})
+        included.add(section)
+    config_cache.save()
+
+
+# only the sections this run needs get their include files loaded
+maintenance = verifyFiles or repairFiles or rollbackTarget or fleetCoordinator or fleetAgent or exportMirror or \
+    relockTargets
+load_includes([section for section, needed in [
+    ("Mods", maintenance or not (noUpdates or onlyCheckServers or updateServers)),
+    ("Servers", maintenance or launchServers or updateServers or watchConfig or
+     not (noUpdates or onlyCheckClient or updateClient)),
+] if needed])
+
 # ===========================
 # Read token and setup githuh
 # ===========================
 git_token = config['Global']['github_token'].get(confuse.Optional(str, default=""))
-try:
-    if len(git_token) == 0:
-        g = Github()
-        logger.info(
-            f"[Config] [GitToken] No configurated github_token, running with a rate limit of {g.rate_limiting[0]}/{g.rate_limiting[1]}")
-    else:
-        g = Github(git_token)
+
+
+def github_login() -> Github:
+    try:
+        if len(git_token) == 0:
+            client = Github()
+            logger.info(
+                "[Config] [GitToken] No configurated github_token, running with a rate limit of %s/%s", client.rate_limiting[0], client.rate_limiting[1])
+        else:
+            client = Github(git_token)
+            logger.info(
+                "[Config] [GitToken] Using configurated github_token, running with a rate limit of %s/%s", client.rate_limiting[0], client.rate_limiting[1])
+    except BadCredentialsException:
+        logger.warning(
+            "[Config] [GitToken] GitHub Token invalid or maybe expired. Check on https://github.com/settings/tokens")
+        client = Github()
         logger.info(
-            f"[Config] [GitToken] Using configurated github_token, running with a rate limit of {g.rate_limiting[0]}/{g.rate_limiting[1]}")
-except BadCredentialsException:
-    logger.warning(
-        f"[Config] [GitToken] GitHub Token invalid or maybe expired. Check on https://github.com/settings/tokens")
-    g = Github()
-    logger.info(
-        f"[Config] [GitToken] Using no GitHub Token, running with a rate limit of {g.rate_limiting[0]}/{g.rate_limiting[1]}")
+            "[Config] [GitToken] Using no GitHub Token, running with a rate limit of %s/%s", client.rate_limiting[0], client.rate_limiting[1])
+    return client
+
+
+class LazyGithub:
+    # logs into GitHub on first use, runs which never check a GitHub repo make no request at all
+    def __init__(self):
+        self.client = None
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self.lock:
+            if self.client is None:
+                self.client = github_login()
+        return getattr(self.client, name)
+
+
+g = LazyGithub()
+
+# seconds to connect and to wait for the next data of a download
+download_timeout = (10, config["Global"]["download_timeout_s"].get(confuse.Optional(int, default=60)))
+
+# downloads up to this size are kept in memory instead of a temp file
+spool_size = config["Global"]["download_spool_mb"].get(confuse.Optional(int, default=32)) * 1024 * 1024
+
+# previous versions of every repo which are kept for -rollback
+keep_versions = config["Global"]["keep_versions"].get(confuse.Optional(int, default=2))
 
-script_queue = []
+# threads used to extract the files of a release zip
+extract_workers = config["Global"]["extract_workers"].get(confuse.Optional(int, default=min(8, os.cpu_count() or 1)))
+
+# write buffer of every extracted file
+write_buffer = config["Global"]["write_buffer_kb"].get(confuse.Optional(int, default=1024)) * 1024
+
+# threads per stage of the update pipeline and the downloads which may wait between two stages
+pipeline_workers = {"resolve": 4, "download": 4, "extract": 2}
+pipeline_workers.update(config["Global"]["pipeline_workers"].get(confuse.Optional(dict, default={})))
+pipeline_depth = config["Global"]["pipeline_depth"].get(confuse.Optional(int, default=4))
+
+# how long the resolved source (GitHub or Thunderstore) of a repo is used before it's probed again
+source_ttl = timedelta(hours=config["Global"]["source_cache_hours"].get(confuse.Optional(int, default=168)))
+
+# port of the coordinator/ agent for the fleet mode
+fleet_port = config["Global"]["fleet_port"].get(confuse.Optional(int, default=8575))
+# interface the coordinator and agents listen on, all by default
+fleet_bind = config["Global"]["fleet_bind"].get(confuse.Optional(str, default=""))
+# shared secret the plan and the peer registrations are signed with, unsigned if empty
+fleet_secret = config["Global"]["fleet_secret"].get(confuse.Optional(str, default="")).encode()
+# agents which didn't renew their registration within this time aren't handed out as peers anymore
+fleet_peer_ttl = config["Global"]["fleet_peer_ttl_s"].get(confuse.Optional(int, default=60))
+fleet = None  # FleetAgent when running with -agent
+
+# local mirror of the releases for hosts without internet access
+mirror_path = mirrorPath or config["Global"]["mirror"].get(confuse.Optional(str, default=""))
+mirror = None  # Mirror when running with -mirror or the Global mirror key
+
+# exact releases of all repos, written by -relock and installed by -frozen
+lockfile_path = Path(config["Global"]["lockfile"].get(confuse.Optional(str, default="manager_lock.json")))
+frozen = None  # Lockfile when running with -frozen
+
+# client updates get staged instead of swapped while the game runs
+launchFirst = launchFirst or config["Global"]["launch_first"].get(confuse.Optional(bool, default=False))
+stage_updates = False
+
+# collects the output and log files of the launched servers, see 'server_log_dir'
+server_logs = None
 
 
 # ===============
@@ -380,23 +761,803 @@ def printhelp():
                 "-onlyCheckClient .......... Looks for updates only for repos defined in the 'manager_config.yaml' under section Manager and Mods without launching the defined launcher in the 'manager_conf.ymal'.\n"
                 "-noUpdate ................. Only launches the defined file from the Launcher section, without checking fpr updates.\n"
                 "-noLaunch ................. Runs the updater over all repos defined in the 'manager_config.yaml' without launching the defined launcher in the 'manager_conf.ymal'.\n"
-                "-launchServers ............ Launches all enabled servers from the 'manager_config.yaml'")
+                "-launchServers ............ Launches all enabled servers from the 'manager_config.yaml'\n"
+                "-verify ................... Compares the installed files of all mods and servers against their release and reports missing, modified and extra files.\n"
+                "-repair ................... Runs -verify and re-extracts only the missing or modified files.\n"
+                "-rollback <target> ........ Restores the previous version of a repo, eg. -rollback Mods/Northstar or -rollback \"Servers/Kraber 9k/Mods/Northstar\".\n"
+                "-benchmarkExtract <zip> ... Extracts the given zip with zipfile and with the parallel extraction and prints both timings.\n"
+                "-target <glob> ............ Only checks the repos matching the glob and everything below them, eg. -target Mods/* or -target \"Servers/Kraber*/Mods/PlayerVote\". Can be given multiple times.\n"
+                "-launchFirst .............. Launches the game right away and stages the updates of the client in the background, they get applied once the game exits.\n"
+                "-coordinator .............. Resolves all mods and servers once and serves the update plan and the release zips to agents on 'fleet_port'.\n"
+                "-agent <url> .............. Updates from the plan of a coordinator, eg. -agent http://192.168.0.10:8575, release zips get fetched from the coordinator or other agents.\n"
+                "-mirror <dir> ............. Installs the releases of a local mirror without any network calls, eg. -mirror D:/NorthstarMirror.\n"
+                "-exportMirror <dir> ....... Downloads the latest release of every repo into a local mirror, which can be copied to hosts without internet access.\n"
+                "-relock ................... Writes the latest release of every repo with its url and hash into the lockfile, without installing anything.\n"
+                "-frozen ................... Installs exactly the releases of the lockfile without any API calls and reports the repos which differ from it.\n"
+                "-watch .................... Keeps running after the launch and re-applies the config of every server whose Config changed in the config files.")
+
+
+# =====================================
+# Token bucket to cap download bandwidth
+# =====================================
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate  # bytes per second
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            # allow bursts of one second, but at least one chunk
+            self.tokens = min(max(self.rate, amount), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BandwidthShaper:
+    def __init__(self, limit, host_limits, background_limit):
+        self.bucket = TokenBucket(limit) if limit > 0 else None
+        self.host_buckets = {host.lower(): TokenBucket(rate) for host, rate in host_limits.items() if rate > 0}
+        self.background = None
+        if background_limit > 0 and servers_running():
+            logger.info("[Download] Servers are running, limiting downloads to %s KB/s", background_limit // 1024)
+            self.background = TokenBucket(background_limit)
+
+    def buckets(self, url) -> list:
+        host = (urlparse(url).hostname or "").lower()
+        buckets = [bucket for name, bucket in self.host_buckets.items() if host == name or host.endswith(f".{name}")]
+        return buckets + [bucket for bucket in [self.bucket, self.background] if bucket is not None]
+
+
+shaper = None
+shaper_lock = threading.Lock()  # the first downloads of the pipeline workers all share one shaper
+
+
+def bandwidth() -> BandwidthShaper:
+    global shaper
+    with shaper_lock:
+        if shaper is None:
+            shaper = BandwidthShaper(
+                config["Global"]["download_limit_kbps"].get(confuse.Optional(int, default=0)) * 1024,
+                {host: int(rate) * 1024 for host, rate in
+                 config["Global"]["host_download_limit_kbps"].get(confuse.Optional(dict, default={})).items()},
+                config["Global"]["background_download_limit_kbps"].get(confuse.Optional(int, default=0)) * 1024)
+    return shaper
+
+
+# ======================================================================
+# Idle priority and a disk write cap for installs while servers are live
+# ======================================================================
+class DiskThrottle:
+    def __init__(self, setting, write_limit):
+        # "auto" only lowers the priority while any managed server is running
+        live = servers_running()
+        self.idle = live if str(setting).lower() == "auto" else setting is True or str(setting).lower() == "true"
+        self.bucket = None
+        self.threads = threading.local()
+        if write_limit > 0 and live:
+            logger.info("[Install] Servers are running, limiting disk writes to %s KB/s", write_limit // 1024)
+            self.bucket = TokenBucket(write_limit)
+        if self.idle:
+            logger.info("[Install] Extracting and copying files at idle CPU and I/O priority")
+
+    def lower_thread(self):
+        # the priority is lowered per worker thread, the main thread keeps it for the game and servers it launches
+        if not self.idle or getattr(self.threads, "lowered", False):
+            return
+        self.threads.lowered = True
+        try:
+            if os.name == "nt":
+                kernel32 = ctypes.windll.kernel32
+                kernel32.SetThreadPriority(kernel32.GetCurrentThread(), 0x00010000)  # THREAD_MODE_BACKGROUND_BEGIN
+            else:
+                thread = psutil.Process(threading.get_native_id())
+                thread.nice(19)
+                if hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+                    thread.ionice(psutil.IOPRIO_CLASS_IDLE)
+        except (psutil.Error, OSError, AttributeError) as error:
+            logger.debug("[Install] Couldn't lower the priority of the thread: %s", error)
+
+    def process_options(self) -> dict:
+        # Popen arguments which start a process of an install, e.g. the xcopy of install_tf2, at low priority
+        if not self.idle:
+            return {}
+        if os.name == "nt":
+            return {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+        return {"preexec_fn": lower_child}
+
+    def lower_process(self, pid):
+        # the I/O priority can't be given to a new process on Windows, it's lowered right after the start
+        if not self.idle or os.name != "nt":
+            return
+        try:
+            psutil.Process(pid).ionice(psutil.IOPRIO_VERYLOW)
+        except (psutil.Error, OSError, AttributeError) as error:
+            logger.debug("[Install] Couldn't lower the I/O priority of process %s: %s", pid, error)
+
+    def write(self, amount):
+        if self.bucket is not None:
+            self.bucket.consume(amount)
+
+
+def lower_child():
+    # runs in the forked child before the command, so it starts at idle priority
+    os.nice(19)
+    if hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+        psutil.Process().ionice(psutil.IOPRIO_CLASS_IDLE)
+
+
+throttle = None
+throttle_lock = threading.Lock()
+
+
+def disk() -> DiskThrottle:
+    global throttle
+    # checked again under the lock, the extract workers all share one throttle
+    if throttle is None:
+        with throttle_lock:
+            if throttle is None:
+                throttle = DiskThrottle(
+                    config["Global"]["idle_priority"].get() if config["Global"]["idle_priority"].exists() else "auto",
+                    config["Global"]["background_write_limit_kbps"].get(confuse.Optional(int, default=0)) * 1024)
+    return throttle
+
+
+# ===============================================================
+# Flushes the files of an extraction once all of them are written
+# ===============================================================
+def sync_files(paths):
+    # only the written files and their folders are flushed, a filesystem wide sync would stall the live servers
+    paths = [path for path in paths if path.is_file()]
+    for path in paths:
+        fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    if os.name != "nt":
+        # the new directory entries, folders can't be opened for a flush on Windows
+        for folder in sorted({path.parent for path in paths}):
+            fd = os.open(folder, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+# ==============================================
+# One progress bar with throughput for downloads
+# ==============================================
+class DownloadProgress:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bar = None
+
+    def start(self, total):
+        with self.lock:
+            if self.bar is None:
+                self.bar = tqdm(total=0, unit_scale=True, unit_divisor=1024, unit="B", desc="Downloads")
+            self.bar.total += total
+            self.bar.refresh()
+
+    def update(self, amount):
+        with self.lock:
+            self.bar.update(amount)
+
+    def finish(self, total, received):
+        # corrects the total for downloads without or with a wrong content-length
+        with self.lock:
+            if received != total:
+                self.bar.total += received - total
+                self.bar.refresh()
+
+    def close(self):
+        with self.lock:
+            if self.bar is not None:
+                self.bar.close()
+                self.bar = None
+
+
+download_progress = DownloadProgress()
+atexit.register(download_progress.close)
 
 
 # ======================
 # Download fun for files
 # ======================
-def download(url, download_file):
-    with requests.get(url, stream=True) as response:
+def download(url, expected_sha256=None):
+    # small files stay in memory, bigger ones get spooled to a temp file
+    sha256 = hashlib.sha256()
+    with requests.get(url, stream=True, timeout=download_timeout) as response:
+        if not response.ok:
+            raise DownloadError(f"Download of {url} failed with status {response.status_code}")
         total = int(response.headers.get("content-length", 0))
         block_size = 1024
+        download_file = io.BytesIO() if total <= spool_size else tempfile.TemporaryFile()
+        buckets = bandwidth().buckets(response.url)
 
-        with tqdm(
-                total=total, unit_scale=True, unit_divisor=block_size, unit="B"
-        ) as progress:
-            for data in response.iter_content(block_size):
-                progress.update(len(data))
+        download_progress.start(total)
+        try:
+            for data in response.iter_content(64 * block_size):
+                for bucket in buckets:
+                    bucket.consume(len(data))
+                if isinstance(download_file, io.BytesIO) and download_file.tell() + len(data) > spool_size:
+                    spooled = tempfile.TemporaryFile()
+                    spooled.write(download_file.getbuffer())
+                    download_file = spooled
+                download_progress.update(len(data))
+                sha256.update(data)
                 download_file.write(data)
+        except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError):
+            pass  # reported as truncated download below, a stalled read times out as ConnectionError
+        finally:
+            download_progress.finish(total, download_file.tell())
+
+    received = download_file.tell()
+    if total > 0 and received != total:
+        download_file.close()
+        raise DownloadError(f"Download of {url} is truncated, received {received} of {total} bytes")
+    if expected_sha256 is not None and sha256.hexdigest() != expected_sha256:
+        download_file.close()
+        raise DownloadError(f"Download of {url} is corrupted, sha256 {sha256.hexdigest()} != {expected_sha256}")
+    download_file.seek(0)
+    return download_file, sha256.hexdigest()
+
+
+# ==========================================================
+# Memory-mapped zip archive which extracts members in parallel
+# ==========================================================
+class MappedArchive:
+    chunk_size = 1024 * 1024
+
+    def __init__(self, file):
+        file.seek(0, os.SEEK_END)
+        if file.tell() == 0:
+            raise zipfile.BadZipFile("File is empty")
+        if isinstance(file, io.BytesIO):
+            # in-memory downloads are read from their buffer without a copy
+            self.mmap = None
+            self.view = file.getbuffer()
+        else:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.mmap)
+        self.zip = zipfile.ZipFile(file)
+
+    def close(self):
+        self.zip.close()
+        self.view.release()
+        if self.mmap is not None:
+            self.mmap.close()
+
+    def chunks(self, info: zipfile.ZipInfo):
+        if info.flag_bits & 0x1 or info.compress_type not in [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]:
+            # encrypted members or other compressions are left to zipfile
+            with self.zip.open(info) as member:
+                while chunk := member.read(self.chunk_size):
+                    yield chunk
+            return
+
+        header = self.view[info.header_offset:info.header_offset + 30]
+        if header[0:4] != b"PK\x03\x04":
+            raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        start = info.header_offset + 30 + name_length + extra_length
+        data = self.view[start:start + info.compress_size]
+
+        if info.compress_type == zipfile.ZIP_STORED:
+            for offset in range(0, len(data), self.chunk_size):
+                yield data[offset:offset + self.chunk_size]
+        else:
+            decompressor = zlib.decompressobj(-15)
+            for offset in range(0, len(data), self.chunk_size):
+                yield decompressor.decompress(data[offset:offset + self.chunk_size])
+            yield decompressor.flush()
+
+    def hash(self, info: zipfile.ZipInfo) -> str:
+        sha256 = hashlib.sha256()
+        for chunk in self.chunks(info):
+            sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def extract(self, info: zipfile.ZipInfo, dest: Path) -> str:
+        sha256 = hashlib.sha256()
+        crc = 0
+        disk().lower_thread()
+        # small decompressed chunks are gathered into large writes
+        with open(dest, "wb", buffering=write_buffer) as target:
+            if info.file_size > 0:
+                try:
+                    if hasattr(os, "posix_fallocate"):
+                        os.posix_fallocate(target.fileno(), 0, info.file_size)
+                    else:
+                        target.truncate(info.file_size)
+                except OSError:
+                    pass
+            for chunk in self.chunks(info):
+                sha256.update(chunk)
+                crc = zlib.crc32(chunk, crc)
+                disk().write(len(chunk))
+                target.write(chunk)
+        if crc != info.CRC:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for file {info.filename}")
+        return sha256.hexdigest()
+
+    def extract_all(self, plan, workers=None) -> list:
+        # create the folders up front, so the workers only write files
+        for folder in sorted({dest.parent for _, dest in plan}):
+            folder.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashes = list(pool.map(lambda member: self.extract(*member), plan))
+        # the files are only synced once the whole plan is written, before anything gets swapped in
+        sync_files([dest for _, dest in plan])
+        return hashes
+
+
+# ===================================
+# Hashes a file, None if it's missing
+# ===================================
+def hash_file(path: Path):
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, "rb") as file:
+            while chunk := file.read(1024 * 1024):
+                sha256.update(chunk)
+    except FileNotFoundError:
+        return None
+    return sha256.hexdigest()
+
+
+# =========================================
+# Index of running processes, scanned once
+# =========================================
+class ProcessIndex:
+    def __init__(self):
+        self.by_exe = {}
+        self.by_cwd = {}
+        self.names = {}
+        self.scan()
+
+    @staticmethod
+    def normpath(path) -> str:
+        return os.path.normcase(os.path.realpath(path))
+
+    def scan(self):
+        self.by_exe.clear()
+        self.by_cwd.clear()
+        self.names.clear()
+        for process in psutil.process_iter(["pid", "name", "exe", "cwd"]):
+            pid = process.info["pid"]
+            if process.info["name"]:
+                self.names.setdefault(process.info["name"], []).append(pid)
+            if process.info["exe"]:
+                self.by_exe.setdefault(self.normpath(process.info["exe"]), []).append(pid)
+            if process.info["cwd"]:
+                self.by_cwd.setdefault(self.normpath(process.info["cwd"]), []).append(pid)
+        logger.debug("[Processes] Indexed %s executables of running processes", len(self.by_exe))
+
+    def has_name(self, name) -> bool:
+        return name in self.names
+
+    def server_pid(self, server_path: Path, exe="NorthstarLauncher.exe"):
+        pids = self.by_exe.get(self.normpath(server_path / exe))
+        if pids:
+            return pids[0]
+        # processes with hidden exe paths can still be matched by name and working directory
+        for pid in self.by_cwd.get(self.normpath(server_path), []):
+            if pid in self.names.get(exe, []):
+                return pid
+        return None
+
+
+process_index = None
+
+
+def running_processes(rescan=False) -> ProcessIndex:
+    global process_index
+    if process_index is None:
+        process_index = ProcessIndex()
+    elif rescan:
+        process_index.scan()
+    return process_index
+
+
+def servers_running() -> bool:
+    servers = config["Servers"].get() if config["Servers"].exists() else {}
+    servers = dict(servers) if isinstance(servers, dict) else {}
+    if "Servers" not in included:
+        # client runs don't load the Servers includes, the servers defined there are running all the same
+        servers.update(read_includes("Servers", strict=False))
+    for server, server_config in [(s, c) for s, c in servers.items() if s not in ["enabled", "on_running"]]:
+        server_config = server_config if isinstance(server_config, dict) else {}
+        if server_config.get("enabled", True) is False:
+            continue
+        if running_processes().server_pid(Path(server_config.get("dir") or f"./Servers/{server}")) is not None:
+            return True
+    return False
+
+
+# ===================================================
+# Lists the yamlpaths of all repos in the config file
+# ===================================================
+def config_targets(manager=True):
+    targets = []
+    if manager and isinstance(config["Manager"].get(), dict):
+        targets.append(["Manager"])
+    if isinstance(config["Mods"].get(), dict):
+        targets += [["Mods", mod] for mod in config["Mods"]]
+    if config["Servers"].exists() and isinstance(config["Servers"].get(), dict):
+        for server in [s for s in config["Servers"] if s not in ["enabled", "on_running"]]:
+            if config["Servers"][server]["Mods"].exists() and isinstance(config["Servers"][server]["Mods"].get(), dict):
+                targets += [["Servers", server, "Mods", mod] for mod in config["Servers"][server]["Mods"]]
+    return targets
+
+
+# ==========================================================
+# Matches yamlpaths against the -target selectors of the run
+# ==========================================================
+def selected(yamlpath) -> bool:
+    # a selector matches a repo or one of its parents, eg. Servers/Kraber* selects all mods of the server
+    if len(targetSelectors) == 0 or "/".join(yamlpath) in dependency_versions:
+        return True
+    return any(fnmatch.fnmatchcase("/".join(yamlpath[:depth]).lower(), selector.lower())
+               for selector in targetSelectors for depth in range(1, len(yamlpath) + 1))
+
+
+def touched(yamlpath) -> bool:
+    # a selector points below a section or server, eg. Servers/Kraber*/Mods/PlayerVote touches Servers/Kraber 9k
+    if selected(yamlpath):
+        return True
+    for parts in [selector.split("/") for selector in targetSelectors]:
+        if len(parts) > len(yamlpath) and all(
+                fnmatch.fnmatchcase(str(name).lower(), part.lower()) for name, part in zip(yamlpath, parts)):
+            return True
+    return False
+
+
+# ================================================
+# Lists the yamlpaths of the repos this run updates
+# ================================================
+def pending_targets():
+    servers_enabled = config["Servers"]["enabled"].get(confuse.Optional(bool, default=True))
+    targets = []
+    for yamlpath in config_targets(manager=not (
+            updateAllIgnoreManager or onlyCheckServers or updateServers or fleet is not None)):
+        if yamlpath[0] == "Mods" and (onlyCheckServers or updateServers):
+            continue
+        if yamlpath[0] == "Servers":
+            if (onlyCheckClient or updateClient) and not updateServers:
+                continue
+            if not updateServers and not updateAllIgnoreManager and (not servers_enabled or not config["Servers"][
+                    yamlpath[1]]["enabled"].get(confuse.Optional(bool, default=True))):
+                continue
+        if not selected(yamlpath):
+            continue
+        targets.append(yamlpath)
+    return targets
+
+# =============================================================================
+# Source of a repo from its config or the state, None if it's never been probed
+# =============================================================================
+def known_source(view):
+    source = view["source"].get(confuse.Optional(str, default=None))
+    cached = state.source(view["repository"].get(confuse.Optional(str, default="")))
+    return str(source).lower() if source is not None else cached["source"] if cached is not None else None
+
+
+# ===========================================================
+# Spends the GitHub rate limit on the most important repos
+# ===========================================================
+class RateBudget:
+    calls = 3  # get_repo, get_releases and get_assets of one repo, get_repo is skipped for known sources
+
+    def __init__(self, targets):
+        deferred_before = state.deferred()
+        ranked = sorted(enumerate(targets), key=lambda item: (
+            self.rank(item[1]), "/".join(item[1]) not in deferred_before, item[0]))
+        # reservations in order of priority, the targets deferred by the last run go first within a rank
+        self.pending = {"/".join(yamlpath): self.cost(yamlpath) for _, yamlpath in ranked}
+        self.deferred = {}
+        self.lock = threading.RLock()  # admitted and finished from the workers of the pipeline
+
+    @staticmethod
+    def view(yamlpath):
+        view = config
+        for index in yamlpath:
+            view = view[index]
+        return view
+
+    def rank(self, yamlpath):
+        view = self.view(yamlpath)
+        if yamlpath == ["Manager"]:
+            return 0, 0
+        if str(view["repository"].get(confuse.Optional(str, default=""))).lower() == "r2northstar/northstar":
+            return 1, 0
+        return 2, -view["priority"].get(confuse.Optional(int, default=0))
+
+    def cost(self, yamlpath) -> int:
+        if release_backend() is not None or "/".join(yamlpath) in dependency_versions:
+            return 0
+        view = self.view(yamlpath)
+        if view["ignore_updates"].get(confuse.Optional(bool, default=False)) and \
+                not (updateAll or updateAllIgnoreManager or updateClient):
+            return 0
+        if yamlpath == ["Manager"]:
+            return self.calls
+        # a known source skips the probe, Thunderstore costs no GitHub requests at all
+        source = known_source(view)
+        if source == "thunderstore":
+            return 0
+        return self.calls - 1 if source == "github" else self.calls
+
+    def order(self, yamlpaths):
+        # runs the repos of one section in order of priority
+        ranks = list(self.pending)
+        return sorted(yamlpaths, key=lambda yamlpath: ranks.index("/".join(yamlpath))
+                      if "/".join(yamlpath) in ranks else len(ranks))
+
+    def admit(self, yamlpath) -> bool:
+        target = "/".join(yamlpath)
+        with self.lock:
+            cost = self.pending.get(target, self.calls if release_backend() is None else 0)
+            if cost == 0:
+                return True
+            reserved = 0
+            for other, other_cost in self.pending.items():
+                if other == target:
+                    break
+                reserved += other_cost
+            remaining = g.rate_limiting[0]
+            if remaining - reserved >= cost:
+                return True
+
+            self.pending.pop(target, None)
+            self.deferred[target] = cost
+        target_logger(yamlpath).warning(
+            "Deferred to the next rate limit window, needs ~%s GitHub requests and %s of the %s left are reserved "
+            "for repos with a higher priority", cost, min(reserved, remaining), remaining)
+        return False
+
+    def done(self, yamlpath):
+        target = "/".join(yamlpath)
+        with self.lock:
+            for other in [other for other in self.pending if other == target or other.startswith(f"{target}/")]:
+                self.pending.pop(other)
+
+    def report(self):
+        state.set_deferred(list(self.deferred))
+        if len(self.deferred) > 0:
+            logger.warning(
+                "[RateLimit] Deferred %s repos until the rate limit resets at %s, run the manager again after that: %s",
+                len(self.deferred), f"{datetime.fromtimestamp(g.rate_limiting_resettime):%H:%M:%S}",
+                ", ".join(self.deferred))
+
+
+rate_budget = None
+
+
+# ===============================================
+# Local state database for installed repositories
+# ===============================================
+class StateStore:
+    schema = """
+        CREATE TABLE IF NOT EXISTS installed (
+            target TEXT PRIMARY KEY,
+            repository TEXT,
+            tag TEXT,
+            published_at TEXT,
+            asset_hash TEXT,
+            installed_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS manifest (
+            target TEXT NOT NULL,
+            path TEXT NOT NULL,
+            member TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (target, path)
+        );
+        CREATE INDEX IF NOT EXISTS manifest_path ON manifest (path);
+        CREATE TABLE IF NOT EXISTS timings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run TEXT NOT NULL,
+            target TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            seconds REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS timings_target ON timings (target, run);
+        CREATE TABLE IF NOT EXISTS versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target TEXT NOT NULL,
+            tag TEXT,
+            published_at TEXT,
+            asset_hash TEXT,
+            path TEXT NOT NULL,
+            units TEXT NOT NULL,
+            manifest TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS versions_target ON versions (target);
+        CREATE TABLE IF NOT EXISTS pending (
+            target TEXT PRIMARY KEY,
+            repository TEXT,
+            tag TEXT,
+            published_at TEXT,
+            asset_hash TEXT,
+            staging TEXT NOT NULL,
+            units TEXT NOT NULL,
+            manifest TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sources (
+            repository TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            canonical TEXT NOT NULL,
+            default_branch TEXT,
+            resolved_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS deferred (
+            target TEXT PRIMARY KEY,
+            deferred_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS swaps (
+            target TEXT PRIMARY KEY,
+            journal TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.run = datetime.now().isoformat(timespec="seconds")
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.executescript(self.schema)
+
+    def installed(self, target):
+        with self.lock:
+            return self.db.execute("SELECT * FROM installed WHERE target = ?", (target,)).fetchone()
+
+    def published_at(self, target) -> datetime:
+        row = self.installed(target)
+        if row is None or row["published_at"] is None:
+            return datetime.min
+        return datetime.fromisoformat(row["published_at"])
+
+    def set_installed(self, target, repository, tag, published_at: datetime, asset_hash=None):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO installed VALUES (?, ?, ?, ?, ?, ?)",
+                (target, repository, tag, published_at.isoformat(), asset_hash,
+                 datetime.now().isoformat(timespec="seconds")))
+
+    def manifest(self, target):
+        with self.lock:
+            return self.db.execute("SELECT * FROM manifest WHERE target = ? ORDER BY path", (target,)).fetchall()
+
+    def manifest_entries(self, target):
+        return [(entry["path"], entry["member"], entry["sha256"], entry["size"]) for entry in self.manifest(target)]
+
+    def set_manifest(self, target, entries):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM manifest WHERE target = ?", (target,))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)",
+                [(target, path, member, sha256, size) for path, member, sha256, size in entries])
+
+    def owners(self, path):
+        with self.lock:
+            return [row["target"] for row in
+                    self.db.execute("SELECT target FROM manifest WHERE path = ?", (path,)).fetchall()]
+
+    def versions(self, target):
+        # kept previous versions, newest release first
+        with self.lock:
+            return self.db.execute("SELECT * FROM versions WHERE target = ? ORDER BY published_at DESC, id DESC",
+                                   (target,)).fetchall()
+
+    def add_version(self, target, installed, path, units, manifest):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT INTO versions (target, tag, published_at, asset_hash, path, units, manifest) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (target, installed["tag"] if installed else None, installed["published_at"] if installed else None,
+                 installed["asset_hash"] if installed else None, str(path), json.dumps(units), json.dumps(manifest)))
+
+    def remove_version(self, version_id):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM versions WHERE id = ?", (version_id,))
+
+    def pending(self):
+        with self.lock:
+            return self.db.execute("SELECT * FROM pending").fetchall()
+
+    def add_pending(self, target, repository, tag, published_at: datetime, asset_hash, staging, units, manifest):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (target, repository, tag, published_at.isoformat(), asset_hash, str(staging),
+                             json.dumps(units), json.dumps(manifest)))
+
+    def remove_pending(self, target):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM pending WHERE target = ?", (target,))
+
+    def swaps(self):
+        with self.lock:
+            return [(row["target"], json.loads(row["journal"])) for row in
+                    self.db.execute("SELECT * FROM swaps").fetchall()]
+
+    def begin_swap(self, target, journal):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO swaps VALUES (?, ?)", (target, json.dumps(journal)))
+
+    def finish_swap(self, target, journal, kept: bool):
+        # the kept version, the new release and the end of the journal in one transaction
+        previous = journal["previous"] or {}
+        with self.lock, self.db:
+            if kept:
+                self.db.execute(
+                    "INSERT INTO versions (target, tag, published_at, asset_hash, path, units, manifest) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (target, previous.get("tag"), previous.get("published_at"), previous.get("asset_hash"),
+                     journal["backup"], json.dumps(journal["units"]), json.dumps(journal["previous_manifest"])))
+            self.db.execute("DELETE FROM manifest WHERE target = ?", (target,))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)",
+                [(target, path, member, sha256, size) for path, member, sha256, size in journal["manifest"]])
+            self.db.execute(
+                "INSERT OR REPLACE INTO installed VALUES (?, ?, ?, ?, ?, ?)",
+                (target, journal["repository"], journal["tag"], journal["published_at"], journal["asset_hash"],
+                 datetime.now().isoformat(timespec="seconds")))
+            self.db.execute("DELETE FROM swaps WHERE target = ?", (target,))
+
+    def source(self, repository):
+        with self.lock:
+            return self.db.execute("SELECT * FROM sources WHERE repository = ?", (str(repository).lower(),)).fetchone()
+
+    def set_source(self, repository, source, canonical, default_branch=None):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                            (str(repository).lower(), source, canonical, default_branch,
+                             datetime.now().isoformat(timespec="seconds")))
+
+    def deferred(self):
+        with self.lock:
+            return {row["target"] for row in self.db.execute("SELECT target FROM deferred").fetchall()}
+
+    def set_deferred(self, targets):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM deferred")
+            self.db.executemany("INSERT INTO deferred VALUES (?, ?)",
+                                [(target, self.run) for target in targets])
+
+    def record_timing(self, target, stage, seconds):
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO timings (run, target, stage, seconds) VALUES (?, ?, ?, ?)",
+                            (self.run, target, stage, seconds))
+
+    def migrate(self):
+        # seeds the database with the 'last_update' values of older 'manager_config.yaml' files
+        migrated = 0
+        for path in config_targets():
+            view = config
+            for index in path:
+                view = view[index]
+            last_update = view["last_update"].get(confuse.Optional(str, default=None))
+            if last_update is None or self.installed("/".join(path)) is not None:
+                continue
+            self.set_installed("/".join(path), view["repository"].get(confuse.Optional(str, default=None)), None,
+                               datetime.fromisoformat(str(last_update)))
+            migrated += 1
+        if migrated > 0:
+            logger.info(
+                "[State] Migrated %s 'last_update' entries from 'manager_config.yaml' to '%s'", migrated, self.path)
+
+
+state = None  # StateStore, opened by main() once the launch args are parsed
 
 
 # ====================================
@@ -404,7 +1565,7 @@ def download(url, download_file):
 # ====================================
 def install_tf2(installpath):
     yamlpath = str(installpath).replace("\\", "] [")
-    logger.info(f"[{yamlpath}] Copying TF2 files and creating a junction for vpk, r2 to {installpath}")
+    logger.info("[%s] Copying TF2 files and creating a junction for vpk, r2 to %s", yamlpath, installpath)
 
     originpath = Path.cwd()
     script = \
@@ -419,9 +1580,12 @@ def install_tf2(installpath):
         f'xcopy "{originpath.joinpath("Titanfall2_trial.exe")}" "{installpath}" /Y /Q >nul 2>&1 && ' \
         f'mklink /j "{installpath.joinpath("vpk")}" "{originpath.joinpath("vpk")}" >nul 2>&1 && ' \
         f'mklink /j "{installpath.joinpath("r2")}" "{originpath.joinpath("r2")}" >nul 2>&1 '
-    subprocess.Popen(script, cwd=str(originpath), shell=True).wait()
+    # xcopy inherits the priority class of the shell, which starts at low priority
+    copy = subprocess.Popen(script, cwd=str(originpath), shell=True, **disk().process_options())
+    disk().lower_process(copy.pid)
+    copy.wait()
 
-    logger.info(f"[{yamlpath}] Successfully copied TF2 files")
+    logger.info("[%s] Successfully copied TF2 files", yamlpath)
 
 
 # =======================================================
@@ -431,6 +1595,16 @@ def sort_gitrelease(release: GitRelease):
     return release.published_at
 
 
+# =====================================================
+# Published sha256 of a GitHub asset, if GitHub has one
+# =====================================================
+def asset_sha256(asset):
+    digest = getattr(asset, "digest", None)
+    if digest and str(digest).startswith("sha256:"):
+        return str(digest).split(":", 1)[1]
+    return None
+
+
 # ==========
 # Exceptions
 # ==========
@@ -438,6 +1612,10 @@ class NoValidRelease(Exception):
     pass
 
 
+class UnknownInstall(NoValidRelease):
+    pass
+
+
 class NoValidAsset(Exception):
     pass
 
@@ -446,7 +1624,19 @@ class FileNotInZip(Exception):
     pass
 
 
-class HaltandRunScripts(Exception):
+class DownloadError(Exception):
+    pass
+
+
+class NotInFleetPlan(Exception):
+    pass
+
+
+class NotInMirror(Exception):
+    pass
+
+
+class NotInLockfile(Exception):
     pass
 
 
@@ -459,51 +1649,50 @@ class SectionHasNoSubSections(Exception):
 # =====================================
 class ManagerUpdater:
     def __init__(self, path):
+        self.log = target_logger(path)
         try:
             yamlpath = config
             for index in path:
                 yamlpath = yamlpath[index]
 
             self.path = path
+            self.target = "/".join(path)
             self.yamlpath = yamlpath
             self.blockname = path[-1]
             self.repository = yamlpath["repository"].get()
-            self.repo = g.get_repo(self.repository)
+            self.repo = g.get_repo(self.repository) if release_backend() is None else None
             self.ignore_updates = yamlpath["ignore_updates"].get(confuse.Optional(bool, default=False))
             self.ignore_prerelease = yamlpath["ignore_prerelease"].get(confuse.Optional(bool, default=True))
             self.install_dir = Path(yamlpath["install_dir"].get(confuse.Optional(str, default=".")))
             self._file = yamlpath["file"].get(confuse.Optional(str, default="NorthstarController.exe"))
             self.file = (self.install_dir / self._file).resolve()
         except ConfigTypeError:
-            logger.error(f"[{'] ['.join(self.path)}] 'manager_config.yaml' is invalid at section: {'/'.join(path)}")
+            self.log.error("'manager_config.yaml' is invalid at section: %s", '/'.join(path))
             quit(1)
 
     @property
     def last_update(self):
-        return datetime.fromisoformat(str(
-            self.yamlpath["last_update"].get(confuse.Optional(str, default=datetime.min.isoformat()))))
-
-    @last_update.setter
-    def last_update(self, value: datetime):
-        config.get()[self.blockname]["last_update"] = value.isoformat()
+        return state.published_at(self.target)
 
-    def release(self):
-        releases = list(self.repo.get_releases())
+    def release(self, latest=False):
+        # only the first page, one request like the RateBudget reserves, it has the newest releases
+        releases = self.repo.get_releases().get_page(0)
         releases.sort(reverse=True, key=sort_gitrelease)
         for release in releases:
             if release.prerelease and self.ignore_prerelease:
                 continue
-            if updateAll or \
+            if latest or \
+                    updateAll or \
                     not self.file.exists() or \
                     release.published_at > self.last_update:
 
                 try:  # if asset not available contine search
                     asset = self.asset(release)
-                    logger.info(
-                        f"[{'] ['.join(self.path)}] Updating to new release for {self.blockname} published Version {release.tag_name}")
+                    self.log.info(
+                        "Updating to new release for %s published Version %s", self.blockname, release.tag_name)
                     return release, asset
                 except NoValidAsset as invalid:
-                    logger.debug(f"[{'] ['.join(self.path)}] {invalid}")
+                    self.log.debug("%s", invalid)
                     continue
 
         raise NoValidRelease("No new release found")
@@ -512,71 +1701,328 @@ class ManagerUpdater:
         assets = release.get_assets()
         for asset in assets:
             if asset.content_type in ["application/octet-stream", "application/x-msdownload"]:
-                logger.debug(f"[{'] ['.join(self.path)}] Found valid asset {asset}")
+                self.log.debug("Found valid asset %s", asset)
                 return asset
         raise NoValidAsset(f"No valid asset was found in {release.tag_name}")
 
     def run(self):
-        logger.info(f"[{'] ['.join(self.path)}] Searching for new releases...")
+        self.log.info("Searching for new releases...")
 
         if self.ignore_updates and not updateAll and not updateClient:
-            logger.info(f"[{'] ['.join(self.path)}] Search stopped for new releases  for {self.blockname}")
+            self.log.info("Search stopped for new releases  for %s", self.blockname)
             return
 
+        # the version renamed aside by the last self-update on Windows
+        try:
+            self.file.with_suffix(".old").unlink(missing_ok=True)
+        except PermissionError:
+            pass
+
         tag = ""
         try:
-            release, asset = self.release()
-            tag = release.tag_name
-            url = asset.browser_download_url
+            backend = release_backend()
+            if backend is not None:
+                url, published_sha256, published_at, tag = backend.resolve(self)
+                size = backend.entry(self)["size"]
+            else:
+                release, asset = self.release()
+                tag = release.tag_name
+                url, published_sha256, published_at, size = \
+                    asset.browser_download_url, asset_sha256(asset), release.published_at, asset.size
 
         except NoValidRelease:
-            logger.info(f"[{'] ['.join(self.path)}] Latest Version already installed for {self.blockname}")
+            self.log.info("Latest Version already installed for %s", self.blockname)
             return
         except NoValidAsset:
-            logger.warning(
-                f"[{'] ['.join(self.path)}] Possibly faulty release for {self.blockname} published Version {tag} has no valit assets")
+            self.log.warning(
+                "Possibly faulty release for %s published Version %s has no valit assets", self.blockname, tag)
+            return
+        except NotInMirror:
+            self.log.warning("%s is not part of the mirror, skipping", self.blockname)
+            return
+        except NotInLockfile:
+            self.log.warning("%s is not part of the lockfile, skipping", self.blockname)
             return
-        with tempfile.NamedTemporaryFile(delete=False) as download_file:
-            logger.info(f"[{'] ['.join(self.path)}] Downloading: {url}")
-            download(url, download_file)
+        self.log.info("Downloading: %s", url)
+        try:
+            download_file, sha256 = backend.download(url, published_sha256) if backend is not None \
+                else download(url, published_sha256)
+            with download_file:
+                self.check(download_file, size)
+                self.swap(download_file)
+        except DownloadError as invalid:
+            self.log.warning("%s", invalid)
+            return
+        state.set_installed(self.target, self.repository, tag, published_at, sha256)
+        self.log.info("Installed successfully update for %s", self.blockname)
 
+        if not getattr(sys, "frozen", False) or stage_updates:
+            self.log.info("The new %s gets used on the next launch", self.file.name)
+            return
+        self.restart()
+
+    def check(self, download_file, size):
+        # the new binary has to be complete and executable before it replaces the running one
+        received = download_file.seek(0, io.SEEK_END)
+        download_file.seek(0)
+        if received == 0 or received != size:
+            raise DownloadError(f"Download of {self.file.name} has {received} of {size} bytes")
+        if self.file.suffix.lower() == ".exe" and download_file.read(2) != b"MZ":
+            raise DownloadError(f"Download of {self.file.name} is not a Windows executable")
+        download_file.seek(0)
+
+    def swap(self, download_file):
         newfile: Path = self.file.with_suffix(".new")
-        shutil.move(download_file.name, newfile)
-        self.last_update = release.published_at
-        logger.info(
-            f"[{'] ['.join(self.path)}] Stopped Updater and rerun new Version of {self.blockname} after install")
-
-        pass_args = " -updateAllIgnoreManager" if updateAll else ""
-        pass_args += " -updateClient -updateAllIgnoreManager" if updateClient else ""
-        pass_args += " -updateServers" if updateServers else ""
-
-        pass_args += " -onlyCheckClient" if onlyCheckClient else ""
-        pass_args += " -onlyCheckServers" if onlyCheckServers else ""
-        pass_args += " -noUpdates" if noUpdates else ""
-
-        pass_args += " -noLaunch" if noLaunch else ""
-        pass_args += " -launchServers" if launchServers else ""
-
-        pass_args += f" -{loglevel[0]}" if len(loglevel) > 0 else ""
+        with open(newfile, "wb") as new:
+            shutil.copyfileobj(download_file, new, 1024 * 1024)
+            new.flush()
+            os.fsync(new.fileno())
+        if self.file.exists():
+            shutil.copymode(self.file, newfile)
+            if os.name == "nt":
+                # a running exe can't be replaced on Windows, but it can be renamed
+                os.replace(self.file, self.file.with_suffix(".old"))
+        os.replace(newfile, self.file)
+
+    def restart(self):
+        # relaunches the new version with the original launch args, without updating the manager again
+        pass_args = []
+        for arg in sys.argv[1:]:
+            if arg.lower() == "-updateall":
+                pass_args.append("-updateAllIgnoreManager")
+            elif arg.lower() == "-updateclient":
+                pass_args += [arg, "-updateAllIgnoreManager"]
+            else:
+                pass_args.append(arg)
+        self.log.info("Launching latest install of %s %s", self.file.name, ' '.join(pass_args))
+
+        write_config()
+        download_progress.close()
+        # stopped here already, a second stop at exit fails on the finished listener thread
+        atexit.unregister(logListener.stop)
+        logListener.stop()
+        if os.name == "nt":
+            exit(subprocess.call([str(self.file)] + pass_args, cwd=str(Path.cwd())))
+        os.execv(self.file, [str(self.file)] + pass_args)
+
+
+# ==========================================
+# Cached package index of Thunderstore
+# ==========================================
+def version_key(version):
+    return tuple(int(part) if part.isdigit() else 0 for part in str(version).split("."))
+
+
+class ThunderstoreIndex:
+    url = "https://northstar.thunderstore.io/api/v1/package/"
+    api = "https://northstar.thunderstore.io/api/experimental/package"
+
+    def __init__(self, path: Path, max_age_hours, packages=None):
+        self.path = path
+        self.max_age = max_age_hours * 3600
+        self.packages = packages  # "namespace-name" in lower case -> full name and versions
+        self.offline = packages is not None  # only knows the given packages, eg. the ones of a mirror
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(name) -> str:
+        # accepts "Namespace/Name", "Namespace-Name" and "Namespace-Name-1.0.0"
+        parts = re.split(r"[/-]", str(name))
+        return "-".join(parts[:2]).lower()
+
+    @staticmethod
+    def compact(package) -> dict:
+        versions = package["versions"] if "versions" in package else [package["latest"]]
+        return {"full_name": package["full_name"],
+                "versions": {version["version_number"]: [version["download_url"], version["date_created"],
+                                                         version["dependencies"]] for version in versions}}
+
+    def load(self):
+        with self.lock:
+            if self.packages is not None:
+                return
+            self.packages = {}
+            fresh = self.path.exists() and time.time() - self.path.stat().st_mtime < self.max_age
+            if not fresh:
+                try:
+                    started = time.perf_counter()
+                    response = requests.get(self.url, timeout=60)
+                    response.raise_for_status()
+                    packages = {self.key(package["full_name"]): self.compact(package) for package in response.json()}
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.path.with_suffix(".part"), "w") as cache:
+                        json.dump(packages, cache)
+                    os.replace(self.path.with_suffix(".part"), self.path)
+                    self.packages = packages
+                    logger.debug("[Thunderstore] Fetched index of %s packages in %.2fs",
+                                 len(packages), time.perf_counter() - started)
+                    return
+                except (requests.exceptions.RequestException, ValueError, KeyError) as error:
+                    logger.warning("[Thunderstore] Could not fetch the package index: %s", error)
+            if self.path.exists():
+                with open(self.path) as cache:
+                    self.packages = json.load(cache)
+                logger.debug("[Thunderstore] Loaded cached index of %s packages", len(self.packages))
+
+    def package(self, name):
+        self.load()
+        return self.packages.get(self.key(name))
+
+    def lookup(self, name):
+        # one package from the per-package endpoint, without loading the whole index
+        key = self.key(name)
+        if self.offline or self.packages is not None and key in self.packages:
+            return self.package(name)
+        response = requests.get(f"{self.api}/{'/'.join(re.split(r'[/-]', str(name))[:2])}/", timeout=30)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return self.compact(response.json())
+
+    def fetch(self, names):
+        # packages missing in the index get fetched one by one, in parallel
+        if self.offline:
+            return
+        self.load()
+        missing = sorted({self.key(name) for name in names} - set(self.packages))
+        if len(missing) == 0:
+            return
 
-        pass_args += " ".join(sys.argv[1::])
-        script_queue.append(
-            f"echo [{time.strftime('%H:%M:%S')}] [INFO   ] Running self-replacer for {self.blockname} && "
-            f"timeout /t 2 /nobreak && "
-            f'del "{self.file}" >nul 2>&1 && '
-            f'move "{newfile}" "{self.file}" >nul 2>&1 && '
-            f"echo [{time.strftime('%H:%M:%S')}] [INFO   ] Installed successfully update for {self.blockname} && "
-            f"echo [{time.strftime('%H:%M:%S')}] [INFO   ] Launching latest install of {self.file.name}{pass_args} && "
-            f'"{self.file.name}"{pass_args}'
-        )
-        raise HaltandRunScripts("restart manager")
+        def fetch_one(key):
+            try:
+                response = requests.get(f"{self.api}/{key.replace('-', '/', 1)}/", timeout=30)
+                return key, self.compact(response.json()) if response.ok else None
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                return key, None
+
+        with ThreadPoolExecutor(max_workers=min(8, len(missing))) as pool:
+            for key, package in pool.map(fetch_one, missing):
+                if package is not None:
+                    with self.lock:
+                        self.packages[key] = package
+
+    def release(self, name, version=None):
+        # download url, publish date and version number of one version, the latest by default
+        package = self.package(name)
+        if package is None or len(package["versions"]) == 0:
+            return None
+        if version not in package["versions"]:
+            version = max(package["versions"], key=version_key)
+        url, date_created, _ = package["versions"][version]
+        return url, datetime.fromisoformat(str(date_created).split(".")[0].removesuffix("Z")), version
+
+    def dependencies(self, name, version=None):
+        package = self.package(name)
+        if package is None or len(package["versions"]) == 0:
+            return []
+        if version not in package["versions"]:
+            version = max(package["versions"], key=version_key)
+        return package["versions"][version][2]
+
+
+thunderstore = ThunderstoreIndex(
+    Path(".NorthstarManager/thunderstore_index.json"),
+    config["Global"]["thunderstore_index_hours"].get(confuse.Optional(int, default=6)))
+dependency_versions = {}  # target of an implicit dependency -> resolved version
+
+
+# ======================================================
+# Adds the Thunderstore dependencies of the mods as repos
+# ======================================================
+CORE_PACKAGES = ["northstar-northstar"]  # installed through R2Northstar/Northstar
+
+
+def thunderstore_root(yamlpath) -> bool:
+    # GitHub repos never touch the package index, unknown ones are checked on their own endpoint
+    view = RateBudget.view(yamlpath)
+    source = known_source(view)
+    if source is not None:
+        return source == "thunderstore"
+    repository = view["repository"].get(confuse.Optional(str, default=""))
+    try:
+        package = thunderstore.lookup(repository)
+    except (requests.exceptions.RequestException, ValueError, KeyError):
+        return thunderstore.package(repository) is not None
+    if package is not None:
+        state.set_source(repository, "thunderstore", package["full_name"].replace("-", "/", 1))
+    return package is not None
+
+
+def resolve_dependencies():
+    scopes = {}
+    for yamlpath in config_targets(manager=False):
+        scopes.setdefault(tuple(yamlpath[:-1]), []).append(yamlpath)
+    repositories = {scope: [thunderstore.key(RateBudget.view(yamlpath)["repository"].get(confuse.Optional(str, default="")))
+                            for yamlpath in yamlpaths] for scope, yamlpaths in scopes.items()}
+    roots = {scope: [thunderstore.key(RateBudget.view(yamlpath)["repository"].get(confuse.Optional(str, default="")))
+                     for yamlpath in yamlpaths if selected(yamlpath) and thunderstore_root(yamlpath)]
+             for scope, yamlpaths in scopes.items()}
+    if not any(len(keys) > 0 for keys in roots.values()):
+        return
+    roots = {scope: [key for key in keys if thunderstore.package(key) is not None] for scope, keys in roots.items()}
+
+    # one version per package for the client and all servers, the highest one any package depends on
+    chosen = {}
+    frontier = sorted({key for keys in roots.values() for key in keys})
+    while len(frontier) > 0:
+        thunderstore.fetch(dependency for key in frontier for dependency in thunderstore.dependencies(key, chosen.get(key)))
+        next_queue = []
+        for key in frontier:
+            for dependency in thunderstore.dependencies(key, chosen.get(key)):
+                dependency_key = thunderstore.key(dependency)
+                version = dependency.rsplit("-", 1)[-1]
+                if dependency_key in CORE_PACKAGES or thunderstore.package(dependency_key) is None:
+                    continue
+                if dependency_key not in chosen or version_key(version) > version_key(chosen[dependency_key]):
+                    chosen[dependency_key] = version
+                    next_queue.append(dependency_key)
+        frontier = sorted(set(next_queue))
+
+    # every package once per client/ server, unless it is configured already
+    implicit = 0
+    for scope, keys in roots.items():
+        configured = set(repositories[scope]) | {yamlpath[-1].lower() for yamlpath in scopes[scope]}
+        needed = []
+        pending = list(keys)
+        while len(pending) > 0:
+            key = pending.pop()
+            for dependency in thunderstore.dependencies(key, chosen.get(key)):
+                dependency_key = thunderstore.key(dependency)
+                if dependency_key in chosen and dependency_key not in configured and dependency_key not in needed:
+                    needed.append(dependency_key)
+                    pending.append(dependency_key)
+        if len(needed) == 0:
+            continue
+
+        mods = {}
+        for key in needed:
+            full_name = thunderstore.package(key)["full_name"]
+            mods[full_name] = {"repository": full_name.replace("-", "/", 1)}
+            dependency_versions["/".join(scope + (full_name,))] = chosen[key]
+            target_logger(list(scope)).info("Adding dependency %s %s", full_name, chosen[key])
+        overlay = mods
+        for index in reversed(scope):
+            overlay = {index: overlay}
+        config.set(overlay)
+        implicit += len(needed)
+    if implicit > 0:
+        logger.info("[Thunderstore] Added %s dependencies of %s unique packages", implicit, len(chosen))
 
 
 # =============================
 # Handles the updating for mods
 # =============================
+MANAGED_CONFIG_FILES = [  # files of Northstar which get rewritten by the manager
+    "ns_startup_args.txt",
+    "ns_startup_args_dedi.txt",
+    "R2Northstar/mods/Northstar.CustomServers/mod.json",
+    "R2Northstar/mods/Northstar.CustomServers/mod/cfg/autoexec_ns_server.cfg",
+]
+
+
 class ModUpdater:
     def __init__(self, yamlpath):
+        self.log = target_logger(yamlpath)
         try:
             if yamlpath[0] == "Servers":
                 serverpath = Path(
@@ -588,6 +2034,8 @@ class ModUpdater:
                 data = data[index]
 
             self.yamlpath = yamlpath
+            self.target = "/".join(yamlpath)
+            self.serverpath = serverpath
             self.data = data
             self.blockname = yamlpath[-1]
             self.ignore_updates = self.data["ignore_updates"].get(confuse.Optional(bool, default=False))
@@ -599,45 +2047,71 @@ class ModUpdater:
             self._file = self.data["file"].get(confuse.Optional(str, default="mod.json"))
             self.file = (self.install_dir / self._file).resolve()
             self.exclude_files = self.data["exclude_files"].get(confuse.Optional(list, default=[]))
+            self.source = self.data["source"].get(confuse.Optional(str, default=None))
+            self.state_dir = serverpath / ".NorthstarManager"
+            self.slug = re.sub(r"[^\w.-]+", "_", self.target)
+            self.repo = None
+            self.is_github = False
 
-            self.repo = f"https://northstar.thunderstore.io/api/experimental/package/{self.repository}"
-            if requests.get(self.repo).status_code == 200:
-                self.is_github = False
-                logger.debug(
-                    f"[{'] ['.join(self.yamlpath)}] Using Repo: northstar.thunderstore.io for {self.repository}")
+        except ConfigTypeError:
+            self.log.error("'manager_config.yaml' is invalid at section: %s", '/'.join(yamlpath))
+            quit(1)
 
+    def resolve_repo(self):
+        if self.repo is not None:
+            return
+        source, canonical = str(self.source).lower(), self.repository
+        if source not in ["github", "thunderstore"]:
+            # the source of a repo never changes, it's only probed again after 'source_cache_hours'
+            cached = state.source(self.repository)
+            if cached is None:
+                source, canonical = self.probe_source()
             else:
-                try:
-                    self.repo = g.get_repo(self.repository)
-                    self.is_github = True
-                    logger.debug(
-                        f"[{'] ['.join(self.yamlpath)}] Using Repo: GitHub for {self.repo}")
-                except UnknownObjectException:
-                    logger.error(
-                        f"[{'] ['.join(self.yamlpath)}] Could not be found in any Repo")
+                source, canonical = cached["source"], cached["canonical"]
+                if datetime.now() - datetime.fromisoformat(cached["resolved_at"]) > source_ttl:
+                    threading.Thread(target=self.probe_source, name=f"source {self.repository}", daemon=True).start()
+
+        self.repo = f"https://northstar.thunderstore.io/api/experimental/package/{canonical}"
+        self.is_github = source == "github"
+        if self.is_github:
+            self.repo = g.get_repo(canonical, lazy=True)
+            self.log.debug("Using Repo: GitHub for %s", canonical)
+        elif source == "thunderstore":
+            self.log.debug("Using Repo: northstar.thunderstore.io for %s", canonical)
+        else:
+            self.log.error("Could not be found in any Repo")
 
-        except ConfigTypeError:
-            logger.error(
-                f"[{'] ['.join(self.yamlpath)}] 'manager_config.yaml' is invalid at section: {'/'.join(yamlpath)}")
-            quit(1)
+    def probe_source(self):
+        # the per-package endpoint first, the full index only if it can't be reached
+        try:
+            package = thunderstore.lookup(self.repository)
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            package = thunderstore.package(self.repository)
+        if package is not None:
+            canonical = package["full_name"].replace("-", "/", 1)
+            state.set_source(self.repository, "thunderstore", canonical)
+            return "thunderstore", canonical
+        try:
+            repo = g.get_repo(self.repository)
+            state.set_source(self.repository, "github", repo.full_name, repo.default_branch)
+            return "github", repo.full_name
+        except UnknownObjectException:
+            return None, self.repository
 
     @property
     def last_update(self):
-        return datetime.fromisoformat(str(
-            self.data["last_update"].get(confuse.Optional(str, default=str(datetime.min.isoformat())))))
+        return state.published_at(self.target)
 
-    @last_update.setter
-    def last_update(self, value: datetime):
-        self.data.get()["last_update"] = value.isoformat()
-
-    def release(self):
-        releases = list(self.repo.get_releases())
+    def release(self, latest=False):
+        # only the first page, one request like the RateBudget reserves, it has the newest releases
+        releases = self.repo.get_releases().get_page(0)
         releases.sort(reverse=True, key=sort_gitrelease)
         for release in releases:
             if release.prerelease and self.ignore_prerelease:
                 continue
 
-            if updateAll \
+            if latest \
+                    or updateAll \
                     or updateAllIgnoreManager \
                     or updateServers \
                     or updateClient \
@@ -650,20 +2124,18 @@ class ModUpdater:
                 return release
         raise NoValidRelease("Found No new releases")
 
-    def asset(self, release: GitRelease) -> str:
-        logger.info(
-            f"[{'] ['.join(self.yamlpath)}] Updating to new release for {self.blockname} published Version {release.tag_name}")
+    def asset(self, release: GitRelease):
         assets = release.get_assets()
 
         if assets.totalCount == 0:  # if no application release exists try download source direct.
-            return release.zipball_url
+            return release.zipball_url, None
         else:
             for asset in [asset for asset in assets if
                           asset.content_type in ["application/zip", "application/x-zip-compressed"]]:
-                return asset.browser_download_url
-            raise NoValidAsset("No valid asset was found in release")
+                return asset.browser_download_url, asset_sha256(asset)
+            raise NoValidAsset(release.tag_name)
 
-    def extract(self, zip_: zipfile.ZipFile):
+    def layout(self, zip_: zipfile.ZipFile) -> Path:
         # find parent folder of file (e.g. mod.json or NorthstarLauncher.exe)
         namelist = zip_.namelist()
         cwd = None
@@ -673,174 +2145,1170 @@ class ModUpdater:
         # check if file exists in zip
         if not cwd:
             raise FileNotInZip()
+        return cwd
 
-        # if updating northstar backup all mods
-        if self.repository == "R2Northstar/Northstar":
-            bakmods = cwd.joinpath("R2Northstar\mods")
-            if not bakmods.exists():
-                logger.debug(
-                    f"[{'] ['.join(self.yamlpath)}] Creating Directory {bakmods}")
-                os.makedirs("R2Northstar\mods")
-            baklst = []
-            for mods in bakmods.iterdir():
-                if mods.name.startswith("Northstar.") or mods.is_file():
-                    continue
-                baklst.append(cwd.joinpath(mods))
+    def members(self, zip_: zipfile.ZipFile):
+        # files of the zip with their path relative to install_dir after the install
+        cwd = self.layout(zip_)
+        infos = [info for info in zip_.infolist() if not info.is_dir() and not info.filename.startswith("/") and
+                 ".." not in PurePosixPath(info.filename).parts]
+        if self.install_dir.joinpath(cwd) == self.install_dir:
+            return [(info, info.filename) for info in infos]
+        return [(info, PurePosixPath(info.filename).relative_to(cwd.as_posix()).as_posix())
+                for info in infos if PurePosixPath(info.filename).is_relative_to(cwd.as_posix())]  # not mods/Foo.Extra
+
+    @staticmethod
+    def unit(path) -> str:
+        # mods of Northstar get swapped as a whole folder, every other file on its own
+        parts = PurePosixPath(path).parts
+        if len(parts) >= 3 and parts[0] == "R2Northstar" and parts[1] == "mods":
+            return "/".join(parts[:3])
+        return path
+
+    def extract(self, archive: MappedArchive, staging: Path):
+        cwd = self.layout(archive.zip)
+
+        # excluded files are only extracted on their first installation
+        excluded = [Path(file).as_posix() for file in self.exclude_files]
+        members = self.members(archive.zip)
+        plan = [(info, path) for info, path in members if not (
+                (path in excluded or PurePosixPath(path).name in excluded) and self.install_dir.joinpath(path).exists())]
+
+        # a mod owns its whole install_dir, Northstar only owns the files of its release
+        if self.install_dir.joinpath(cwd) != self.install_dir and \
+                self.install_dir.resolve() != self.serverpath.resolve():
+            units = ["."]
+        else:
+            units = sorted({self.unit(path) for _, path in plan})
+
+        # extract into a staging dir, the install_dir is only touched by the swap
+        if staging.exists():
+            shutil.rmtree(staging)
+        hashes = archive.extract_all([(info, staging.joinpath(path)) for info, path in plan], extract_workers)
+        manifest = [(path, info.filename, sha256, info.file_size) for (info, path), sha256 in zip(plan, hashes)]
+        self.log.debug("Extracted %s files into %s", len(plan), staging)
+        return units, [entry for entry in manifest if entry[0] not in excluded and Path(entry[0]).name not in excluded]
+
+    def swap(self, staging: Path, units, tag, published_at: datetime, asset_hash, manifest):
+        # carry over excluded files which are inside of a swapped folder
+        excluded = [Path(file).as_posix() for file in self.exclude_files]
+        for file in [file for file in excluded if self.install_dir.joinpath(file).is_file()]:
+            if not staging.joinpath(file).exists() and \
+                    any(unit == "." or file.startswith(f"{unit}/") for unit in units):
+                staging.joinpath(file).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(self.install_dir.joinpath(file), staging.joinpath(file))
+
+        # the journal is written before anything is moved, so the next start finishes an interrupted swap
+        installed = state.installed(self.target)
+        backup = self.state_dir / "versions" / self.slug / \
+            f"{datetime.now():%Y%m%d%H%M%S%f}-{installed['tag'] if installed and installed['tag'] else 'unknown'}"
+        journal = {"install_dir": str(self.install_dir), "staging": str(staging), "backup": str(backup),
+                   "units": [unit for unit in units if staging.joinpath(unit).exists()],
+                   "previous": dict(installed) if installed else None,
+                   "previous_manifest": state.manifest_entries(self.target), "repository": self.repository,
+                   "tag": tag, "published_at": published_at.isoformat(), "asset_hash": asset_hash,
+                   "manifest": manifest}
+        state.begin_swap(self.target, journal)
+        complete_swap(self.target, journal)
+        self.evict_versions()
+
+    def evict_versions(self):
+        for version in state.versions(self.target)[keep_versions:]:
+            shutil.rmtree(version["path"], ignore_errors=True)
+            state.remove_version(version["id"])
+            self.log.debug("Evicted kept version %s", version['path'])
+
+    def rollback(self) -> bool:
+        versions = state.versions(self.target)
+        if len(versions) == 0:
+            self.log.warning("No previous version kept for %s", self.blockname)
+            return False
+        installed = state.installed(self.target)
+        # step back to the newest kept version older than the installed one
+        older = [version for version in versions if installed is None or not installed["published_at"] or
+                 not version["published_at"] or version["published_at"] < installed["published_at"]]
+        version = older[0] if len(older) > 0 else versions[0]
+        manifest = state.manifest_entries(self.target)
+        forward = self.state_dir / "versions" / self.slug / \
+            f"{datetime.now():%Y%m%d%H%M%S%f}-{installed['tag'] if installed and installed['tag'] else 'unknown'}"
+
+        units = json.loads(version["units"])
+        for unit in units:
+            if self.install_dir.joinpath(unit).exists():
+                forward.joinpath(unit).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(self.install_dir.joinpath(unit), forward.joinpath(unit))
+            if Path(version["path"]).joinpath(unit).exists():
+                self.install_dir.joinpath(unit).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(Path(version["path"]).joinpath(unit), self.install_dir.joinpath(unit))
+        shutil.rmtree(version["path"], ignore_errors=True)
+        state.remove_version(version["id"])
+
+        state.set_manifest(self.target, json.loads(version["manifest"]))
+        state.set_installed(self.target, self.repository, version["tag"],
+                            datetime.fromisoformat(version["published_at"] or datetime.min.isoformat()),
+                            version["asset_hash"])
+        if forward.exists():
+            state.add_version(self.target, installed, forward, units, manifest)
+            self.evict_versions()
+        self.log.info(
+            "Rolled back %s to version %s, set ignore_updates to keep it on the next update", self.blockname, version['tag'])
+        return True
 
-            if not cwd.joinpath(".bakmods").exists():
-                cwd.joinpath(".bakmods").mkdir()
+    @property
+    def core(self) -> bool:
+        # Northstar itself, the mods of the same install have to wait until it's installed
+        return self._file == "NorthstarLauncher.exe" or str(self.repository).lower() == "r2northstar/northstar"
 
-            for mod in baklst:
-                shutil.move(cwd.joinpath(mod), cwd.joinpath(".bakmods"))
+    def wanted(self) -> bool:
+        self.log.info("Searching for new releases...")
+        if self.ignore_updates and not updateAllIgnoreManager and not updateClient:
+            self.log.info("Search stopped for new releases  for %s", self.blockname)
+            return False
+        return rate_budget.admit(self.yamlpath)
 
-        # create backup file for excluded files
-        for file in [file for file in self.exclude_files if self.install_dir.joinpath(file).exists()]:
+    def fetch_release(self):
+        # url, published sha256, publish date and tag of the release to install, None if nothing gets installed
+        started = time.perf_counter()
+        backend = release_backend()
+        try:
+            release = backend.resolve(self) if backend is not None else self.resolve()
+        except NoValidRelease:
+            self.log.info("Latest Version already installed for %s", self.blockname)
+            return None
+        except NoValidAsset as faulty:
+            self.log.warning(
+                "Possibly faulty release for %s published Version %s has no valit assets", self.blockname, faulty)
+            return None
+        except NotInFleetPlan:
+            self.log.warning("%s is not part of the plan of the coordinator, skipping", self.blockname)
+            return None
+        except NotInMirror:
+            self.log.warning("%s is not part of the mirror, skipping", self.blockname)
+            return None
+        except NotInLockfile:
+            self.log.warning("%s is not part of the lockfile, run -relock to add it, skipping", self.blockname)
+            return None
+        state.record_timing(self.target, "resolve", time.perf_counter() - started)
+        return release
+
+    def fetch(self, release):
+        # the verified download and its sha256, None if the download failed
+        url, published_sha256, _, _ = release
+        self.log.info("Downloading: %s", url)
+        started = time.perf_counter()
+        backend = release_backend()
+        try:
+            download_file, sha256 = backend.download(url, published_sha256) if backend is not None \
+                else download(url, published_sha256)
+        except DownloadError as invalid:
+            self.log.warning("%s, keeping the installed version", invalid)
+            return None
+        state.record_timing(self.target, "download", time.perf_counter() - started)
+        return download_file, sha256
+
+    def install(self, release, download_file, sha256):
+        url, _, t, tag = release
+        with download_file:
+            if not zipfile.is_zipfile(download_file):
+                self.log.warning("Download of %s is not a valid zip file, keeping the installed version", url)
+                return
+
+            started = time.perf_counter()
+            staged = stage_updates and self.yamlpath[0] == "Mods"
+            staging = self.state_dir / ("pending" if staged else "staging") / self.slug
+            archive = MappedArchive(download_file)
             try:
-                # if source and destination in same folder aka for Northstar installs
-                shutil.copy(self.install_dir.joinpath(file), self.install_dir)
-            except shutil.SameFileError:
-                pass
-            self.install_dir.joinpath(Path(file).name).rename(self.install_dir.joinpath(f"{Path(file).name}.bak"))
-            logger.debug(f"[{'] ['.join(self.yamlpath)}] Created {self.install_dir.joinpath(f'{Path(file).name}.bak')}")
-
-        if self.install_dir.joinpath(cwd) == self.install_dir:
-            # extract zip into install_dir
-            for fileinfo in zip_.infolist():
-                zip_.extract(fileinfo.filename, self.install_dir)
-                logger.debug(f"[{'] ['.join(self.yamlpath)}] Extract Downloaded zip into {self.install_dir}")
+                units, manifest = self.extract(archive, staging)
+            finally:
+                archive.close()
+            state.record_timing(self.target, "extract", time.perf_counter() - started)
+
+        if staged:
+            # the game is running, the swap waits until it exits
+            state.add_pending(self.target, self.repository, tag, t, sha256, staging, units, manifest)
+            self.log.info("Staged update for %s, it gets applied once the game exits", self.blockname)
+            return
+        self.swap(staging, units, tag, t, sha256, manifest)
+        self.log.info("Installed successfully update for %s", self.blockname)
+
+    def resolve(self, latest=False):
+        # url, published sha256, publish date and tag of the release to install
+        self.resolve_repo()
+        if self.is_github:
+            release = self.release(latest)
+            self.log.info("Updating to new release for %s published Version %s", self.blockname, release.tag_name)
+            url, published_sha256 = self.asset(release)
+            return url, published_sha256, release.published_at, release.tag_name
+
+        if self.target in dependency_versions:
+            # dependencies install the version resolved for all packages
+            url, t, version = thunderstore.release(self.repository, dependency_versions[self.target])
+        else:
+            package = requests.get(str(self.repo)).json()["latest"]
+            url, t, version = package["download_url"], datetime.fromisoformat(
+                str(package["date_created"]).split(".")[0]), str(package["version_number"])
+        if latest \
+                or updateAllIgnoreManager \
+                or updateServers \
+                or updateClient \
+                or not self.file.exists() \
+                or t > self.last_update:
+            return url, None, t, version
+        raise NoValidRelease("no new Release found")
+
+    def installed_release(self):
+        # download of the installed release with the hash recorded at install time
+        installed = state.installed(self.target)
+        if installed is not None and installed["tag"] is None and installed["published_at"] and \
+                release_backend() is None:
+            installed = self.migrated_release(installed)
+        if installed is None or installed["tag"] is None:
+            raise UnknownInstall("Installed release is unknown")
+        backend = release_backend()
+        if backend is not None:
+            return backend.installed(self, installed["asset_hash"])
+        self.resolve_repo()
+        if self.is_github:
+            url, _ = self.asset(self.repo.get_release(installed["tag"]))
+        else:
+            url = requests.get(f"{self.repo}/{installed['tag']}/").json()["download_url"]
+        return url, installed["asset_hash"]
+
+    def migrated_release(self, installed):
+        # installs migrated from 'last_update' have no tag, the release with the same publish date is the installed one
+        published_at = datetime.fromisoformat(installed["published_at"])
+        self.resolve_repo()
+        tag = None
+        if self.is_github:
+            for release in self.repo.get_releases():
+                if release.published_at.replace(tzinfo=None) == published_at:
+                    tag = release.tag_name
+                    break
+        else:
+            package = thunderstore.package(self.repository) or {"versions": {}}
+            for version, (_, date_created, _) in package["versions"].items():
+                if datetime.fromisoformat(str(date_created).split(".")[0].rstrip("Z")) == published_at:
+                    tag = version
+                    break
+        if tag is None:
+            return installed
+        state.set_installed(self.target, installed["repository"], tag, published_at, installed["asset_hash"])
+        self.log.info("Found the installed release %s by its publish date", tag)
+        return state.installed(self.target)
+
+    def download_installed_release(self):
+        url, sha256 = self.installed_release()
+        self.log.info("Downloading: %s", url)
+        backend = release_backend()
+        download_file, _ = backend.download(url, sha256) if backend is not None else download(url, sha256)
+        return MappedArchive(download_file)
+
+    def skipped_files(self):
+        # excluded files and configs edited by the manager are expected to differ from the release
+        skipped = [Path(file).as_posix() for file in self.exclude_files]
+        if self.install_dir.resolve() == self.serverpath.resolve():
+            skipped += MANAGED_CONFIG_FILES
+        return skipped
+
+    def verify(self, pool: ThreadPoolExecutor, repair=False) -> bool:
+        archive = None
+        expected = {entry["path"]: (entry["member"], entry["sha256"]) for entry in state.manifest(self.target)}
+        if len(expected) == 0:
+            # no manifest was recorded for this install, compare against the release zip instead
+            self.log.info("No manifest recorded, comparing against the release zip")
+            archive = self.download_installed_release()
+            members = self.members(archive.zip)
+            hashes = list(pool.map(lambda member: archive.hash(member[0]), members))
+            expected = {path: (info.filename, sha256) for (info, path), sha256 in zip(members, hashes)}
+            state.set_manifest(self.target, [(path, info.filename, sha256, info.file_size)
+                                             for (info, path), sha256 in zip(members, hashes)])
+
+        skipped = self.skipped_files()
+        expected = {path: value for path, value in expected.items()
+                    if path not in skipped and PurePosixPath(path).name not in skipped}
+
+        missing, modified = [], []
+        for path, sha256 in zip(expected.keys(),
+                                pool.map(lambda p: hash_file(self.install_dir.joinpath(p)), expected.keys())):
+            if sha256 is None:
+                missing.append(path)
+            elif sha256 != expected[path][1]:
+                modified.append(path)
+
+        # look for extra files only in directories owned by the release
+        if self.install_dir.resolve() == self.serverpath.resolve():
+            owned = {PurePosixPath(path).parent for path in expected.keys()} - {PurePosixPath(".")}
+            candidates = [file for folder in owned if self.install_dir.joinpath(folder).is_dir()
+                          for file in self.install_dir.joinpath(folder).iterdir() if file.is_file()]
+        else:
+            candidates = [file for file in self.install_dir.rglob("*") if file.is_file()]
+        extra = sorted({file.relative_to(self.install_dir).as_posix() for file in candidates} -
+                       set(expected.keys()) - set(skipped))
+
+        for path in missing:
+            self.log.warning("Missing file %s", path)
+        for path in modified:
+            self.log.warning("Modified file %s", path)
+        for path in extra:
+            self.log.info("Extra file %s", path)
+        self.log.info(
+            "Verified %s files for %s: %s missing, %s modified, %s extra", len(expected), self.blockname, len(missing), len(modified), len(extra))
+
+        damaged = missing + modified
+        if len(damaged) == 0 or not repair:
+            if archive is not None:
+                archive.close()
+            return len(damaged) == 0
+
+        if archive is None:
+            archive = self.download_installed_release()
+        try:
+            archive.extract_all([(archive.zip.getinfo(expected[path][0]), self.install_dir.joinpath(path))
+                                 for path in damaged], extract_workers)
+        finally:
+            archive.close()
+        self.log.info("Repaired %s files for %s: %s", len(damaged), self.blockname, ', '.join(damaged))
+        return True
 
-            # move backup file of excluded files if exists
-            for file in [file for file in self.exclude_files if Path(f"{Path(file).name}.bak").exists()]:
-                newfile = self.install_dir.joinpath(file)
-                shutil.move(self.install_dir.joinpath(f"{Path(file).name}.bak"), newfile)
-                logger.debug(
-                    f"[{'] ['.join(self.yamlpath)}] Replace {newfile} with backup file {self.install_dir.joinpath(f'{Path(file).name}.bak')}")
 
+# ==========================================
+# Release zips shared between fleet members
+# ==========================================
+class ArtifactStore:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def file(self, sha256):
+        if not re.fullmatch(r"[0-9a-f]{64}", str(sha256)):
+            return None
+        path = self.path / f"{sha256}.zip"
+        return path if path.exists() else None
+
+    def add(self, download_file, sha256):
+        self.path.mkdir(parents=True, exist_ok=True)
+        part = self.path / f"{sha256}.zip.{threading.get_ident()}.part"  # the same zip can be added in parallel
+        download_file.seek(0)
+        with open(part, "wb") as artifact:
+            shutil.copyfileobj(download_file, artifact, 1024 * 1024)
+        os.replace(part, self.path / f"{sha256}.zip")
+        download_file.seek(0)
+
+
+# ================================================
+# HTTP protocol between coordinator, agents, peers
+# ================================================
+class FleetServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store: ArtifactStore, plan=None):
+        super().__init__(address, FleetHandler)
+        self.store = store
+        self.plan = plan  # only the coordinator serves a plan and knows the peers
+        self.peers = {}  # peer -> time of its last registration
+        self.lock = threading.Lock()
+
+    def live_peers(self) -> list:
+        # agents exit after their update, peers which stopped renewing their registration expire
+        with self.lock:
+            now = time.monotonic()
+            for peer in [peer for peer, seen in self.peers.items() if now - seen > fleet_peer_ttl]:
+                del self.peers[peer]
+                logger.info("[Fleet] Agent %s expired", peer)
+            return list(self.peers)
+
+
+def fleet_signature(body: bytes) -> str:
+    return hmac.new(fleet_secret, body, hashlib.sha256).hexdigest()
+
+
+def fleet_signed(body: bytes, signature) -> bool:
+    return len(fleet_secret) == 0 or hmac.compare_digest(fleet_signature(body), str(signature or ""))
+
+
+class FleetHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/plan" and self.server.plan is not None:
+            self.send_json({"targets": self.server.plan, "peers": self.server.live_peers()})
+        elif self.path == "/peers" and self.server.plan is not None:
+            self.send_json(self.server.live_peers())
+        elif self.path.startswith("/artifact/") and self.server.store.file(self.path.removeprefix("/artifact/")):
+            artifact = self.server.store.file(self.path.removeprefix("/artifact/"))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/zip")
+            self.send_header("Content-Length", str(artifact.stat().st_size))
+            self.end_headers()
+            with open(artifact, "rb") as file:
+                shutil.copyfileobj(file, self.wfile, 1024 * 1024)
         else:
-            # extract zip with some magic
-            for fileinfo in [info for info in zip_.infolist() if info.filename.startswith(cwd.as_posix())]:
-                path = fileinfo.filename
-
-                if Path(path).name not in self.exclude_files:
-                    zip_.extract(path, self.install_dir)
-                    logger.debug(f"[{'] ['.join(self.yamlpath)}] Extract Downloaded zip into {self.install_dir}")
-                else:
-                    if not Path(path).exists():  # check for first time installation of excluded files
-                        zip_.extract(path, self.install_dir)
-                        logger.debug(f"[{'] ['.join(self.yamlpath)}] Extract Downloaded zip into {self.install_dir}")
-
-            # delete old files because shutil cant replace-copy
-            for replace in [r for r in self.install_dir.iterdir() if
-                            r.name != self.install_dir.joinpath(cwd.parts[0]).name]:
-                # filter for exclude files
-                if replace.name.endswith(".bak"):
-                    continue
+            self.send_error(404)
+
+    def peer(self):
+        # the peer of a signed registration, None if the request got answered with an error
+        if self.path != "/peers" or self.server.plan is None:
+            self.send_error(404)
+            return None
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not fleet_signed(body, self.headers.get("X-Fleet-Signature")):
+            self.send_error(403)
+            return None
+        try:
+            port = int(json.loads(body)["port"])
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return None
+        return f"http://{self.client_address[0]}:{port}"
+
+    def do_POST(self):
+        # agents register the port they serve their release zips on and renew it while they run
+        peer = self.peer()
+        if peer is None:
+            return
+        with self.server.lock:
+            if peer not in self.server.peers:
+                logger.info("[Fleet] Agent %s joined", peer)
+            self.server.peers[peer] = time.monotonic()
+        self.send_json({"peer": peer, "peers": self.server.live_peers()})
+
+    def do_DELETE(self):
+        # agents deregister when they exit
+        peer = self.peer()
+        if peer is None:
+            return
+        with self.server.lock:
+            if self.server.peers.pop(peer, None) is not None:
+                logger.info("[Fleet] Agent %s left", peer)
+        self.send_json({"peer": peer})
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Fleet-Signature", fleet_signature(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("[Fleet] %s " + format, self.address_string(), *args)
+
+
+# ===================================================
+# resolves all repos once and serves the update plan
+# ===================================================
+def coordinator():
+    store = ArtifactStore(Path(".NorthstarManager/artifacts"))
+    plan = []
+    artifacts = {}
+    global rate_budget
+    if config["Global"]["resolve_dependencies"].get(confuse.Optional(bool, default=True)):
+        resolve_dependencies()
+    rate_budget = RateBudget([yamlpath for yamlpath in config_targets(manager=False) if selected(yamlpath)])
+    for yamlpath in [yamlpath for yamlpath in config_targets(manager=False) if selected(yamlpath)]:
+        updater = ModUpdater(yamlpath)
+        if not rate_budget.admit(yamlpath):
+            continue
+        try:
+            url, published_sha256, t, tag = updater.resolve(latest=True)
+            if url not in artifacts and published_sha256 and store.file(published_sha256):
+                artifacts[url] = published_sha256
+            if url not in artifacts:
+                updater.log.info("Downloading: %s", url)
+                download_file, sha256 = download(url, published_sha256)
+                with download_file:
+                    if not zipfile.is_zipfile(download_file):
+                        raise DownloadError(f"Download of {url} is not a valid zip file")
+                    store.add(download_file, sha256)
+                artifacts[url] = sha256
+        except NoValidRelease:
+            updater.log.warning("No release found for %s", updater.blockname)
+            continue
+        except NoValidAsset as faulty:
+            updater.log.warning(
+                "Possibly faulty release for %s published Version %s has no valit assets", updater.blockname, faulty)
+            continue
+        except DownloadError as invalid:
+            updater.log.warning("%s, leaving it out of the plan", invalid)
+            continue
+        except (RateLimitExceededException, ConnectionError):
+            updater.log.warning("Rate limit exceeded, leaving it out of the plan")
+            continue
+        finally:
+            rate_budget.done(yamlpath)
+        plan.append({"target": updater.target, "repository": updater.repository, "tag": tag,
+                     "published_at": t.isoformat(), "sha256": artifacts[url],
+                     "implicit": updater.target in dependency_versions})
+    download_progress.close()
+    rate_budget.report()
+
+    server = FleetServer((fleet_bind, fleet_port), store, plan)
+    logger.info("[Fleet] Serving the plan of %s repos on %s:%s, stop with Ctrl+C", len(plan), fleet_bind or "*", fleet_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# =====================================================
+# updates from the plan and the zips of the coordinator
+# =====================================================
+class FleetAgent:
+    def __init__(self, url):
+        self.coordinator = url
+        self.store = ArtifactStore(Path(".NorthstarManager/artifacts"))
+        self.peer = None
+        self.server = None
+        self.stopped = threading.Event()
+        try:
+            response = requests.get(f"{url}/plan", timeout=10)
+            if not fleet_signed(response.content, response.headers.get("X-Fleet-Signature")):
+                logger.error("[Fleet] The plan of %s isn't signed with the 'fleet_secret' of this config", url)
+                exit(1)
+            plan = response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            logger.error("[Fleet] Coordinator %s is not reachable", url)
+            exit(1)
+        self.plan = {entry["target"]: entry for entry in plan["targets"]}
+        # dependencies resolved by the coordinator for a client/ server this agent has as well
+        scopes = {"/".join(yamlpath[:-1]) for yamlpath in config_targets(manager=False)}
+        for entry in [entry for entry in plan["targets"] if entry.get("implicit")]:
+            scope, name = entry["target"].rsplit("/", 1)
+            if scope in scopes:
+                overlay = {name: {"repository": entry["repository"]}}
+                for index in reversed(scope.split("/")):
+                    overlay = {index: overlay}
+                config.set(overlay)
+        logger.info("[Fleet] Received the plan of %s repos from %s", len(self.plan), url)
+
+        # serve the fetched zips to the other agents
+        try:
+            self.server = FleetServer((fleet_bind, fleet_port), self.store)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            self.peer = self.register(requests.post).json()["peer"]
+            threading.Thread(target=self.heartbeat, name="fleet heartbeat", daemon=True).start()
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning("[Fleet] Could not share release zips with other agents on port %s: %s", fleet_port, error)
+
+    def register(self, method):
+        body = json.dumps({"port": self.server.server_address[1]}).encode()
+        response = method(f"{self.coordinator}/peers", data=body, timeout=10, headers={
+            "Content-Type": "application/json", "X-Fleet-Signature": fleet_signature(body)})
+        response.raise_for_status()
+        return response
+
+    def heartbeat(self):
+        # renews the registration, so the coordinator keeps handing this agent out as a peer
+        while not self.stopped.wait(max(1, fleet_peer_ttl // 3)):
+            try:
+                self.register(requests.post)
+            except requests.exceptions.RequestException as error:
+                logger.debug("[Fleet] Could not renew the registration: %s", error)
+
+    def resolve(self, updater: ModUpdater):
+        entry = self.plan.get(updater.target)
+        if entry is None or entry["repository"] != updater.repository:
+            raise NotInFleetPlan(updater.target)
+        installed = state.installed(updater.target)
+        if not (updateAll or updateAllIgnoreManager or updateServers or updateClient) and updater.file.exists() and \
+                installed is not None and installed["asset_hash"] == entry["sha256"]:
+            raise NoValidRelease("Release of the plan already installed")
+        updater.log.info("Updating to planned release for %s published Version %s", updater.blockname, entry['tag'])
+        return f"{self.coordinator}/artifact/{entry['sha256']}", entry["sha256"], \
+            datetime.fromisoformat(entry["published_at"]), entry["tag"]
+
+    def installed(self, updater: ModUpdater, sha256):
+        # the installed release, if the plan still has it
+        entry = self.plan.get(updater.target)
+        if entry is None or entry["sha256"] != sha256:
+            raise NoValidRelease("Installed release is not part of the plan of the coordinator")
+        return f"{self.coordinator}/artifact/{sha256}", sha256
+
+    def download(self, url, sha256):
+        cached = self.store.file(sha256)
+        if cached is not None:
+            return open(cached, "rb"), sha256
+
+        # other agents first to take load off the coordinator
+        try:
+            peers = [peer for peer in requests.get(f"{self.coordinator}/peers", timeout=10).json() if peer != self.peer]
+        except (requests.exceptions.RequestException, ValueError):
+            peers = []
+        random.shuffle(peers)
+        for source in [f"{peer}/artifact/{sha256}" for peer in peers] + [url]:
+            try:
+                download_file, _ = download(source, sha256)
+            except (DownloadError, requests.exceptions.RequestException) as invalid:
+                logger.debug("[Fleet] %s", invalid)
+                continue
+            logger.debug("[Fleet] Fetched %s from %s", sha256, source)
+            self.store.add(download_file, sha256)
+            return download_file, sha256
+        raise DownloadError(f"Release zip {sha256} is not available from the coordinator or other agents")
+
+    def close(self):
+        self.stopped.set()
+        if self.server is not None:
+            if self.peer is not None:
+                try:
+                    self.register(requests.delete)
+                except requests.exceptions.RequestException as error:
+                    logger.debug("[Fleet] Could not deregister from the coordinator: %s", error)
+            self.server.shutdown()
+            self.server.server_close()
+
+
+# ==============================================
+# Local mirror of release zips and their metadata
+# ==============================================
+class Mirror:
+    def __init__(self, path: Path):
+        self.path = path
+        self.releases = {}  # repository in lower case -> release of the mirror
+        self.packages = {}  # Thunderstore packages of the releases, to resolve dependencies offline
+        try:
+            with open(path / "index.json") as index:
+                data = json.load(index)
+            self.releases, self.packages = data["releases"], data.get("thunderstore", {})
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as error:
+            logger.error("[Mirror] '%s' is invalid: %s", path / "index.json", error)
+
+    def release(self, repository):
+        return self.releases.get(str(repository).lower())
+
+    def entry(self, updater):
+        return self.release(updater.repository)
+
+    def resolve(self, updater):
+        release = self.release(updater.repository)
+        if release is None:
+            raise NotInMirror(updater.repository)
+        installed = state.installed(updater.target)
+        if not (updateAll or updateAllIgnoreManager or updateServers or updateClient) and updater.file.exists() and \
+                installed is not None and installed["asset_hash"] == release["sha256"]:
+            raise NoValidRelease("Release of the mirror already installed")
+        updater.log.info("Updating to mirrored release for %s published Version %s", updater.blockname, release['tag'])
+        return str(self.path / release["asset"]), release["sha256"], \
+            datetime.fromisoformat(release["published_at"]), release["tag"]
+
+    def installed(self, updater, sha256):
+        # the installed release, if the mirror still has it
+        release = self.release(updater.repository)
+        if release is None or release["sha256"] != sha256:
+            raise NoValidRelease("Installed release is not part of the mirror")
+        return str(self.path / release["asset"]), sha256
+
+    @staticmethod
+    def download(url, sha256):
+        # copied by hand, so the file gets checked against the index
+        if hash_file(Path(url)) != sha256:
+            raise DownloadError(f"{url} is missing or doesn't match the hash of the mirror")
+        return open(url, "rb"), sha256
+
+    def add(self, repository, release, download_file, sha256):
+        url, _, published_at, tag = release
+        suffix = PurePosixPath(urlparse(url).path).suffix.lower()
+        asset = f"artifacts/{sha256}{suffix if suffix in ['.exe', '.zip'] else '.zip'}"
+        size = download_file.seek(0, io.SEEK_END)
+        if not self.path.joinpath(asset).exists():
+            self.path.joinpath(asset).parent.mkdir(parents=True, exist_ok=True)
+            part = self.path.joinpath(f"{asset}.part")
+            download_file.seek(0)
+            with open(part, "wb") as artifact:
+                shutil.copyfileobj(download_file, artifact, 1024 * 1024)
+            os.replace(part, self.path.joinpath(asset))
+        self.releases[str(repository).lower()] = {
+            "repository": repository, "tag": tag, "published_at": published_at.isoformat(), "asset": asset,
+            "url": url, "sha256": sha256, "size": size}
+
+    def save(self):
+        # files no release refers to anymore get removed
+        assets = {release["asset"] for release in self.releases.values()}
+        for file in self.path.joinpath("artifacts").glob("*"):
+            if f"artifacts/{file.name}" not in assets:
+                file.unlink()
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "index.part", "w") as index:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"), "releases": self.releases,
+                       "thunderstore": self.packages}, index, indent=2)
+        os.replace(self.path / "index.part", self.path / "index.json")
+
+
+# =====================================================
+# downloads the latest release of every repo to a mirror
+# =====================================================
+def export_mirror(path: Path) -> bool:
+    global rate_budget
+    export = Mirror(path)
+    if config["Global"]["resolve_dependencies"].get(confuse.Optional(bool, default=True)):
+        resolve_dependencies()
+    yamlpaths = [yamlpath for yamlpath in config_targets() if selected(yamlpath)]
+    rate_budget = RateBudget(yamlpaths)
+    exported = 0
+    for yamlpath in yamlpaths:
+        if not rate_budget.admit(yamlpath):
+            continue
+        try:
+            if yamlpath == ["Manager"]:
+                updater = ManagerUpdater(yamlpath)
+                latest, asset = updater.release(latest=True)
+                release = asset.browser_download_url, asset_sha256(asset), latest.published_at, latest.tag_name
+            else:
+                updater = ModUpdater(yamlpath)
+                release = updater.resolve(latest=True)
+            current = export.release(updater.repository)
+            if current is not None and current["url"] == release[0] and path.joinpath(current["asset"]).exists():
+                updater.log.info("Mirror already has %s %s", updater.blockname, current['tag'])
+                continue
 
-                if replace.is_dir():
-                    shutil.rmtree(replace)
-                    logger.debug(f"[{'] ['.join(self.yamlpath)}] Delete old dir {replace}")
-                elif replace.is_file():
-                    Path.unlink(replace)
-                    logger.debug(f"[{'] ['.join(self.yamlpath)}] Delete old file {replace}")
-
-            # copy
-            for files in self.install_dir.joinpath(cwd).iterdir():
-                shutil.move(files, self.install_dir)
-                logger.debug(f"[{'] ['.join(self.yamlpath)}] Replace {self.install_dir} with backup file {files}")
-
-            # delete empty dir
-            shutil.rmtree(self.install_dir.joinpath(cwd.parts[0]))
-            logger.debug(f"[{'] ['.join(self.yamlpath)}] Delete old dir {self.install_dir.joinpath(cwd.parts[0])}")
-
-            # delete new and past old excluded file
-            for file in [file for file in self.exclude_files if
-                         self.install_dir.joinpath(f"{Path(file).name}.bak").exists()]:
-                newfile = self.install_dir.joinpath(file)
-                newfile.unlink()
-                logger.debug(f"[{'] ['.join(self.yamlpath)}] Delete old file {newfile}")
-                shutil.move(self.install_dir.joinpath(f"{Path(file).name}.bak"), newfile)
-                logger.debug(
-                    f"[{'] ['.join(self.yamlpath)}] Replace {newfile} with backup file {self.install_dir.joinpath(f'{Path(file).name}.bak')}")
-
-        # if updating northstar move backup mods back to mod folder
-        if self.repository == "R2Northstar/Northstar":
-            baklst = []
-            for mod in cwd.joinpath(".bakmods").iterdir():
-                baklst.append(cwd.joinpath(mod))
-
-            for mod in baklst:
-                shutil.move(cwd.joinpath(mod), cwd.joinpath("R2Northstar\mods"))
-
-            cwd.joinpath(".bakmods").rmdir()
+            updater.log.info("Downloading: %s", release[0])
+            download_file, sha256 = download(release[0], release[1])
+            with download_file:
+                if yamlpath != ["Manager"] and not zipfile.is_zipfile(download_file):
+                    raise DownloadError(f"Download of {release[0]} is not a valid zip file")
+                export.add(updater.repository, release, download_file, sha256)
+            exported += 1
+        except NoValidRelease:
+            target_logger(yamlpath).warning("No release found, leaving it out of the mirror")
+        except NoValidAsset as faulty:
+            target_logger(yamlpath).warning("Possibly faulty release %s has no valit assets", faulty)
+        except DownloadError as invalid:
+            target_logger(yamlpath).warning("%s, leaving it out of the mirror", invalid)
+        except (RateLimitExceededException, ConnectionError):
+            target_logger(yamlpath).warning("Rate limit exceeded, leaving it out of the mirror")
+        finally:
+            rate_budget.done(yamlpath)
+    download_progress.close()
+
+    # the Thunderstore packages of the mirrored versions resolve the dependencies on the offline hosts
+    for release in export.releases.values():
+        package = thunderstore.package(release["repository"])
+        if package is not None:
+            versions = package["versions"]
+            export.packages[thunderstore.key(release["repository"])] = {
+                "full_name": package["full_name"],
+                "versions": {release["tag"]: versions[release["tag"]]} if release["tag"] in versions else versions}
+    export.save()
+    rate_budget.report()
+    logger.info("[Mirror] Exported %s new releases, '%s' has %s releases", exported, path, len(export.releases))
+    return True
 
-    def run(self):
-        logger.info(f"[{'] ['.join(self.yamlpath)}] Searching for new releases...")
-        if self.ignore_updates and not updateAllIgnoreManager and not updateClient:
-            logger.info(f"[{'] ['.join(self.yamlpath)}] Search stopped for new releases  for {self.blockname}")
-            return
 
-        tag = ""
+# =========================================================
+# Lockfile with the exact release of every repo, -frozen
+# =========================================================
+class Lockfile:
+    def __init__(self, path: Path):
+        self.path = path
+        self.targets = {}  # target -> locked release
         try:
-            if self.is_github:
-                release = self.release()
-                url = self.asset(release)
-                t = release.published_at
-                tag = release.tag_name
+            with open(path) as lockfile:
+                self.targets = json.load(lockfile)["targets"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as error:
+            logger.error("[Lock] '%s' is invalid: %s", path, error)
+
+    def entry(self, updater):
+        return self.targets.get(updater.target)
+
+    def add_implicit(self):
+        # dependencies locked for a client/ server of this config, they aren't resolved again
+        scopes = {"/".join(yamlpath[:-1]) for yamlpath in config_targets(manager=False)}
+        for target, entry in [(target, entry) for target, entry in self.targets.items() if entry.get("implicit")]:
+            scope, name = target.rsplit("/", 1)
+            if scope in scopes:
+                overlay = {name: {"repository": entry["repository"]}}
+                for index in reversed(scope.split("/")):
+                    overlay = {index: overlay}
+                config.set(overlay)
+
+    def resolve(self, updater):
+        entry = self.entry(updater)
+        if entry is None or entry["repository"] != updater.repository:
+            raise NotInLockfile(updater.target)
+        installed = state.installed(updater.target)
+        if not (updateAll or updateAllIgnoreManager or updateServers or updateClient) and updater.file.exists() and \
+                installed is not None and installed["asset_hash"] == entry["sha256"]:
+            raise NoValidRelease("Release of the lockfile already installed")
+        updater.log.info("Updating to locked release for %s published Version %s", updater.blockname, entry['tag'])
+        return entry["url"], entry["sha256"], datetime.fromisoformat(entry["published_at"]), entry["tag"]
+
+    def installed(self, updater, sha256):
+        # the installed release, if it's the locked one
+        entry = self.entry(updater)
+        if entry is None or entry["sha256"] != sha256:
+            raise NoValidRelease("Installed release is not the locked release")
+        return entry["url"], sha256
+
+    @staticmethod
+    def download(url, sha256):
+        return download(url, sha256)
+
+    def lock(self, updater, release, size=None):
+        url, sha256, published_at, tag = release
+        self.targets[updater.target] = {
+            "repository": updater.repository, "tag": tag, "published_at": published_at.isoformat(), "url": url,
+            "sha256": sha256, "size": size, "implicit": updater.target in dependency_versions}
+
+    def check(self) -> bool:
+        # every host with the same lockfile has the same hashes installed
+        targets = ["/".join(yamlpath) for yamlpath in config_targets() if selected(yamlpath)]
+        differing = [target for target, entry in self.targets.items() if target in targets and
+                     (state.installed(target) or {}).get("asset_hash") != entry["sha256"]]
+        if len(differing) > 0:
+            logger.warning("[Lock] %s repos differ from the lockfile: %s", len(differing), ", ".join(differing))
+            return False
+        logger.info("[Lock] All installed repos match the lockfile")
+        return True
 
+    def save(self):
+        with open(self.path.with_suffix(".part"), "w") as lockfile:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                       "targets": dict(sorted(self.targets.items()))}, lockfile, indent=2)
+        os.replace(self.path.with_suffix(".part"), self.path)
+
+
+def release_backend():
+    # resolves and downloads the releases instead of GitHub/ Thunderstore
+    for backend in [fleet, mirror, frozen]:
+        if backend is not None:
+            return backend
+    return None
+
+
+# =========================================================
+# writes the latest release of every repo into the lockfile
+# =========================================================
+def relock(path: Path) -> bool:
+    global rate_budget
+    lockfile = Lockfile(path)
+    if config["Global"]["resolve_dependencies"].get(confuse.Optional(bool, default=True)):
+        resolve_dependencies()
+    yamlpaths = [yamlpath for yamlpath in config_targets() if selected(yamlpath)]
+    rate_budget = RateBudget(yamlpaths)
+    locked = 0
+    for yamlpath in yamlpaths:
+        if not rate_budget.admit(yamlpath):
+            continue
+        try:
+            size = None
+            if yamlpath == ["Manager"]:
+                updater = ManagerUpdater(yamlpath)
+                latest, asset = updater.release(latest=True)
+                release = asset.browser_download_url, asset_sha256(asset), latest.published_at, latest.tag_name
+                size = asset.size
             else:
-                t = datetime.fromisoformat(
-                    str(requests.get(str(self.repo)).json()["latest"]["date_created"]).split(".")[0])
-                tag = str(requests.get(str(self.repo)).json()["latest"]["version_number"])
-                if updateAllIgnoreManager \
-                        or updateServers \
-                        or updateClient \
-                        or not self.file.exists() \
-                        or t > self.last_update:
-                    url = requests.get(str(self.repo)).json()["latest"]["download_url"]
-                else:
-                    raise NoValidRelease("no new Release found")
+                updater = ModUpdater(yamlpath)
+                release = updater.resolve(latest=True)
+
+            url, sha256, published_at, tag = release
+            current = lockfile.entry(updater)
+            if sha256 is None and current is not None and current["url"] == url:
+                sha256, size = current["sha256"], current["size"]
+            elif sha256 is None:
+                # releases without a published hash get downloaded once to hash them
+                updater.log.info("Downloading: %s", url)
+                download_file, sha256 = download(url)
+                with download_file:
+                    size = download_file.seek(0, io.SEEK_END)
+            lockfile.lock(updater, (url, sha256, published_at, tag), size)
+            locked += 1
+        except NoValidRelease:
+            target_logger(yamlpath).warning("No release found, keeping its locked release")
+        except NoValidAsset as faulty:
+            target_logger(yamlpath).warning("Possibly faulty release %s has no valit assets", faulty)
+        except DownloadError as invalid:
+            target_logger(yamlpath).warning("%s, keeping its locked release", invalid)
+        except (RateLimitExceededException, ConnectionError):
+            target_logger(yamlpath).warning("Rate limit exceeded, keeping its locked release")
+        finally:
+            rate_budget.done(yamlpath)
+    download_progress.close()
+
+    # repos which got removed from the config
+    targets = ["/".join(yamlpath) for yamlpath in config_targets()]
+    lockfile.targets = {target: entry for target, entry in lockfile.targets.items() if target in targets}
+    lockfile.save()
+    rate_budget.report()
+    logger.info("[Lock] Locked %s repos, '%s' has %s repos", locked, path, len(lockfile.targets))
+    return True
 
-            with tempfile.NamedTemporaryFile() as download_file:
-                logger.info(f"[{'] ['.join(self.yamlpath)}] Downloading: {url}")
-                download(url, download_file)
-                release_zip = zipfile.ZipFile(download_file)
-                self.extract(release_zip)
-                self.last_update = t
-                logger.info(f"[{'] ['.join(self.yamlpath)}] Installed successfully update for {self.blockname}")
 
-        except NoValidRelease:
-            logger.info(f"[{'] ['.join(self.yamlpath)}] Latest Version already installed for {self.blockname}")
-            return
-        except NoValidAsset:
-            logger.warning(
-                f"[{'] ['.join(self.yamlpath)}] Possibly faulty release for {self.blockname} published Version {tag} has no valit assets")
+# =========================================================
+# Runs the updates as resolve, download, extract and config
+# =========================================================
+class UpdateJob:
+    def __init__(self, updater: ModUpdater, group):
+        self.updater = updater
+        self.group = group
+        self.root = updater.serverpath.resolve()
+        self.release = None
+        self.download = None
+
+
+class Pipeline:
+    stages = ["resolve", "download", "extract", "config"]
+
+    def __init__(self):
+        self.workers = {stage: max(1, int(pipeline_workers.get(stage, 1))) for stage in self.stages[:-1]}
+        self.workers["config"] = 1  # the config files are rewritten one client/ server at a time
+        # the bounded queues hold back the resolver and downloader, so only a few downloads wait at once
+        self.queues = {"resolve": queue.Queue(), "download": queue.Queue(maxsize=pipeline_depth),
+                       "extract": queue.Queue(maxsize=pipeline_depth), "config": queue.Queue()}
+        self.busy = dict.fromkeys(self.stages, 0.0)
+        self.jobs = []
+        self.configs = {}  # group -> applies the config once all updates of the group are done
+        self.unfinished = {}  # group -> updates of the group which are not done yet
+        self.cores = {}  # install root -> updates of Northstar which are not done yet
+        self.parked = {}  # install root -> downloaded mods waiting for Northstar
+        self.overflow = []  # parked mods which didn't fit into the full extract queue
+        self.locked = []  # groups with files locked by a running server
+        self.rate_limited = None  # yamlpath which exceeded the GitHub rate limit
+        self.open_groups = 0
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def add(self, group, yamlpaths, apply_config):
+        self.configs[group] = apply_config
+        self.unfinished[group] = len(yamlpaths)
+        for yamlpath in yamlpaths:
+            job = UpdateJob(ModUpdater(yamlpath), group)
+            if job.updater.core:
+                self.cores[job.root] = self.cores.get(job.root, 0) + 1
+            self.jobs.append(job)
+
+    def run(self):
+        if len(self.configs) == 0:
             return
+        started = time.perf_counter()
+        self.open_groups = len(self.configs)
+        handlers = {"resolve": self.resolve, "download": self.download, "extract": self.extract,
+                    "config": self.apply_config}
+        threads = [threading.Thread(target=self.work, args=(stage, handlers[stage]), name=f"{stage} {number}",
+                                    daemon=True) for stage in self.stages for number in range(self.workers[stage])]
+        for thread in threads:
+            thread.start()
+
+        for group in [group for group, unfinished in self.unfinished.items() if unfinished == 0]:
+            self.queues["config"].put(group)
+        for job in self.jobs:
+            self.queues["resolve"].put(job)
+        self.finished.wait()
+
+        for stage in self.stages:
+            for _ in range(self.workers[stage]):
+                self.queues[stage].put(None)
+        for thread in threads:
+            thread.join()
+        self.report(time.perf_counter() - started)
+
+    def work(self, stage, handler):
+        while (item := self.queues[stage].get()) is not None:
+            self.handle(stage, handler, item)
+            while stage == "extract" and (item := self.overflowed()) is not None:
+                self.handle(stage, handler, item)
+
+    def handle(self, stage, handler, item):
+        started = time.perf_counter()
+        try:
+            handler(item)
+        except Exception as error:  # a failed update must not stall the other stages
+            if stage == "config":
+                logger.error("[Config] Applying the config failed: %s", error)
+            else:
+                item.updater.log.error("Update failed in the %s stage: %s", stage, error)
+                self.unpark(self.finish(item))
+        finally:
+            with self.lock:
+                self.busy[stage] += time.perf_counter() - started
+
+    def resolve(self, job: UpdateJob):
+        try:
+            job.release = job.updater.fetch_release() if job.updater.wanted() else None
+        except (RateLimitExceededException, ConnectionError):
+            job.updater.log.warning("Rate limit exceeded")
+            self.rate_limited = self.rate_limited or job.updater.yamlpath
+        if job.release is None:
+            self.unpark(self.finish(job))
+        else:
+            self.queues["download"].put(job)
+
+    def download(self, job: UpdateJob):
+        job.download = job.updater.fetch(job.release)
+        if job.download is None:
+            self.unpark(self.finish(job))
+        else:
+            self.queues["extract"].put(job)
+
+    def extract(self, job: UpdateJob):
+        disk().lower_thread()
+        with self.lock:
+            if not job.updater.core and self.cores.get(job.root, 0) > 0:
+                self.parked.setdefault(job.root, []).append(job)
+                return
+        jobs = [job]
+        while len(jobs) > 0:
+            job = jobs.pop(0)
+            try:
+                job.updater.install(job.release, *job.download)
+            except FileNotInZip:
+                job.updater.log.warning("Zip file for doesn't contain expected files")
+            except PermissionError as permission:
+                job.updater.log.warning("File (%s) is locked, server is still running", Path(permission.filename).name)
+                with self.lock:
+                    self.locked.append(job.group)
+            except Exception as error:
+                job.updater.log.error("Update failed in the extract stage: %s", error)
+            # the mods which waited for Northstar get installed right after it
+            jobs += self.finish(job)
+
+    def unpark(self, parked):
+        # never blocks, an extract worker would otherwise wait on its own full queue. Under the lock, so a worker
+        # which took the last queued job checks the overflow only after the job was added to it
+        with self.lock:
+            for job in parked:
+                try:
+                    self.queues["extract"].put_nowait(job)
+                except queue.Full:
+                    self.overflow.append(job)
+
+    def overflowed(self):
+        with self.lock:
+            return self.overflow.pop(0) if len(self.overflow) > 0 else None
+
+    def finish(self, job: UpdateJob) -> list:
+        # returns the parked mods which can be installed now
+        rate_budget.done(job.updater.yamlpath)
+        parked = []
+        with self.lock:
+            if job.updater.core:
+                self.cores[job.root] -= 1
+                if self.cores[job.root] == 0:
+                    parked = self.parked.pop(job.root, [])
+            self.unfinished[job.group] -= 1
+            done = self.unfinished[job.group] == 0
+        if done:
+            self.queues["config"].put(job.group)
+        return parked
+
+    def apply_config(self, group):
+        try:
+            if group not in self.locked:
+                self.configs[group]()
+        except PermissionError as permission:
+            logger.warning("File (%s) is locked, server is still running", Path(permission.filename).name)
+            with self.lock:
+                self.locked.append(group)
+        except FileNotFoundError as file_not_found:
+            logger.error("[Config] File (%s) does not exist", Path(file_not_found.filename).name)
+        finally:
+            with self.lock:
+                self.open_groups -= 1
+                if self.open_groups == 0:
+                    self.finished.set()
+
+    def report(self, seconds):
+        seconds = max(seconds, 0.001)
+        utilization = ", ".join(
+            f"{stage} {100 * self.busy[stage] / (seconds * self.workers[stage]):.0f}% of {self.workers[stage]}"
+            for stage in self.stages)
+        logger.info("[Pipeline] Checked %s repos in %.1fs, busy: %s", len(self.jobs), seconds, utilization)
 
 
 # ====
 # main
 # ====
 def main():
+    global fleet, mirror, frozen, thunderstore, state
+
     # prints help
     if showHelp:
         printhelp()
         exit(0)
 
+    # compares the extraction of zipfile against the parallel extraction
+    if benchmarkExtract:
+        benchmark_extract(Path(benchmarkExtract))
+        exit(0)
+
+    # every other mode reads or writes the installed releases
+    state = StateStore("manager_state.db")
+    state.migrate()
+    recover_swaps()
+
+    # restores the previous version of a repo instead of updating
+    if rollbackTarget:
+        exit(0 if rollback(rollbackTarget) else 1)
+
+    # serves the update plan to agents instead of updating
+    if fleetCoordinator:
+        coordinator()
+        exit(0)
+
+    # downloads the releases into a mirror for hosts without internet access
+    if exportMirror:
+        exit(0 if export_mirror(Path(exportMirror)) else 1)
+
+    # writes the latest releases into the lockfile instead of updating
+    if relockTargets:
+        exit(0 if relock(lockfile_path) else 1)
+
+    # updates from the plan of the coordinator instead of upstream
+    if fleetAgent:
+        fleet = FleetAgent(fleetAgent)
+
+    # installs from a local mirror instead of upstream
+    elif len(mirror_path) > 0:
+        mirror = Mirror(Path(mirror_path))
+        if len(mirror.releases) == 0:
+            logger.error("[Mirror] '%s' has no 'index.json' with releases, create it with -exportMirror", mirror_path)
+            exit(1)
+        thunderstore = ThunderstoreIndex(thunderstore.path, 0, mirror.packages)
+        logger.info("[Mirror] Installing from the %s releases of '%s'", len(mirror.releases), mirror_path)
+
+    # installs the locked releases instead of the latest ones
+    elif frozenInstall:
+        frozen = Lockfile(lockfile_path)
+        if len(frozen.targets) == 0:
+            logger.error("[Lock] '%s' has no locked repos, create it with -relock", lockfile_path)
+            exit(1)
+        frozen.add_implicit()
+
+    # verifies or repairs the installed files instead of updating, through the same backend as the updates
+    if verifyFiles or repairFiles:
+        valid = verify()
+        if fleet is not None:
+            fleet.close()
+        exit(0 if valid else 1)
+
+    # applies the updates staged while the game was running on the last launch
+    if len(state.pending()) > 0 and not game_running(rescan=False):
+        apply_pending()
+
+    # launches the game with the installed version and updates in the background
+    if launchFirst and not noUpdates and not noLaunch:
+        launch_first()
+        return
+
     if not noUpdates:
         # check for updates/ manages updates / installs updates
         try:
             # restart updater when encountering a GitHub rate error
             while not updater():
-                logger.info(f"Waiting and re-trying to update in 60s...")
+                logger.info("Waiting and re-trying to update in 60s...")
                 time.sleep(60)
+            download_progress.close()
+            if fleet is not None:
+                fleet.close()
+            if frozen is not None:
+                frozen.check()
 
         except PermissionError as permission:
-            logger.error(f"Server ({Path(permission.filename).parent.name}) is still running")
+            logger.error("Server (%s) is still running", Path(permission.filename).parent.name)
             exit(1)
-        except HaltandRunScripts:
-            for script in script_queue:
-                subprocess.Popen(script, cwd=str(Path.cwd()), shell=True)
-            return
 
     # launches all enabled servers
     if launchServers:
@@ -850,101 +3318,188 @@ def main():
     if not noLaunch:
         launcher()
 
+    # re-applies the config of servers when the config files change
+    if watchConfig:
+        watch()
+
+    # collects the output of the launched servers until they exit
+    if server_logs is not None:
+        if not watchConfig:
+            server_logs.wait()
+        server_logs.close()
+
 
 # =================================
 # reads config and performs updates
 # =================================
 def updater() -> bool:
-    for section in [s for s in config.keys() if s not in ["Global", "Launcher"]]:
+    global rate_budget
+    if fleet is None and frozen is None and len(dependency_versions) == 0 and \
+            config["Global"]["resolve_dependencies"].get(confuse.Optional(bool, default=True)):
+        resolve_dependencies()
+    rate_budget = RateBudget(pending_targets())
+    pipeline = Pipeline()
+    deferred = []
+    for section in [s for s in config.keys() if s not in ["Global", "Launcher", "Include"]]:
         yamlpath = [section]
         try:
             if section == "Manager":
-                if not updateAllIgnoreManager and not onlyCheckServers and not updateServers:
+                if not updateAllIgnoreManager and not onlyCheckServers and not updateServers and fleet is None and \
+                        selected(yamlpath):
                     if config[section].get() is None:
                         raise SectionHasNoSubSections(yamlpath)
-                    ManagerUpdater(yamlpath).run()
+                    if rate_budget.admit(yamlpath):
+                        ManagerUpdater(yamlpath).run()
+                    rate_budget.done(yamlpath)
 
             elif section == "Mods":
-                if not onlyCheckServers and not updateServers:
-                    if config[section].get() is None:
-                        raise SectionHasNoSubSections(yamlpath)
-                    for mod in config[section]:
-                        yamlpath = [section, mod]
-                        ModUpdater(yamlpath).run()
-
-                    section = "Launcher"
-                    logger.info(f"[Config] Applying configurations")
-                    logger.debug(f"[Config] [ns_startup_args.txt] Applying config...")
+                if not onlyCheckServers and not updateServers and touched([section]):
                     if config[section].get() is None:
                         raise SectionHasNoSubSections(yamlpath)
-
-                    replace_str = ""
-                    config_list = str(config[section]["arguments"].get(confuse.Optional(str, default=""))).strip() + " "
-                    c_dict = {}
-                    config_value = ""
-                    for c in re.split('([-+])', config_list)[1:]:
-                        if c == "+" or c == "-":
-                            config_value = c
-                            continue
-                        config_value += c
-                        config_value.strip()
-                        split = config_value.split(" ")
-                        c_dict[split[0]] = split[1] if len(split[1:-1]) == 1 else " ".join(split[1:-1])
-
-                    with open("ns_startup_args.txt", 'r') as replace:
-                        while line := replace.readline():
-                            line = line.strip()
-                            config_value = ""
-                            for c in re.split('([-+])', line)[1:]:
-                                if c == "+" or c == "-":
-                                    config_value = c
-                                    continue
-                                config_value += c
-                                config_value.strip()
-                                split = config_value.split(" ")
-                                key = split[0]
-                                va = split[1] if len(split[1:-1]) == 1 else " ".join(split[1:-1])
-
-                                if key in c_dict.keys():
-                                    continue
-                                replace_str += f"{key} {va} "
-
-                    for k, v in c_dict.items():
-                        replace_str += f"{k} {v} "
-                    replace_str = replace_str.replace("  ", " ").strip()
-
-                    # write new config to file
-                    with open("ns_startup_args.txt", "w") as replace:
-                        replace.write(replace_str)
+                    pipeline.add((section,), rate_budget.order(
+                        [[section, mod] for mod in config[section] if selected([section, mod])]), apply_launcher_config)
 
             elif section == "Servers":
-                if (not onlyCheckClient and not updateClient) or updateServers:
+                if ((not onlyCheckClient and not updateClient) or updateServers) and touched([section]):
                     if config[section].get() is None:
                         raise SectionHasNoSubSections(yamlpath)
                     if not updateServers:
                         if not config[section]["enabled"].get(
                                 confuse.Optional(bool, default=True)) and not updateAllIgnoreManager:
-                            logger.info(f"[{'] ['.join(yamlpath)}] Searvers are disabled")
+                            target_logger(yamlpath).info("Searvers are disabled")
                             continue
-                    for server in [s for s in config[section] if s not in ["enabled"]]:
+                    for server in [s for s in config[section] if s not in ["enabled", "on_running"]]:
                         yamlpath = [section, server]
+                        if not touched(yamlpath):
+                            continue
                         if config[section].get() is None:
                             raise SectionHasNoSubSections(yamlpath)
                         if not updateServers and not updateAllIgnoreManager:
                             if not config[section][server]["enabled"].get(confuse.Optional(bool, default=True)):
-                                logger.info(f"[{'] ['.join(yamlpath)}] Server: {server} is disabled")
+                                target_logger(yamlpath).info("Server: %s is disabled", server)
                                 continue
-                        server_path = Path(
-                            config[section][server]["dir"].get(confuse.Optional(str, default=f"./Servers/{server}")))
-                        if not server_path.joinpath("Titanfall2.exe").exists():
-                            logger.warning(
-                                f"[{'] ['.join(yamlpath)}] Titanfall2 files invalid or don't exists at server location")
-                            install_tf2(server_path)
-                        if not server_path.joinpath("auto_restart.bat").exists():
-                            logger.warning(
-                                f"[{'] ['.join(yamlpath)}] Auto-Restart script not found at server location")
-                            with open(server_path.joinpath("auto_restart.bat"), "w") as auto_restart:
-                                auto_restart.write('''@echo off 
+                        if not prepare_server(server):
+                            deferred.append(server)
+                            rate_budget.done(yamlpath)
+                            continue
+                        pipeline.add((section, server), server_mods(server),
+                                     lambda server=server: apply_server_config(server))
+
+            else:
+                target_logger(yamlpath).warning("Unknown Section %s", section)
+
+        except SectionHasNoSubSections:
+            target_logger(yamlpath).warning("Skipping Section, config is invalid or is missing subsections")
+            return True
+
+        except (RateLimitExceededException, ConnectionError):
+            target_logger(yamlpath).warning("Rate limit exceeded")
+            if not retry_rate_limit(yamlpath):
+                break
+            return False
+
+        except FileNotFoundError as file_not_found:
+            target_logger(yamlpath).error("File (%s) does not exist", Path(file_not_found.filename).name)
+            exit(1)
+
+    # the client and all servers update at once, each stage with its own workers
+    pipeline.run()
+    if pipeline.rate_limited is not None and retry_rate_limit(pipeline.rate_limited):
+        return False
+
+    deferred += [group[1] for group in pipeline.locked if group[0] == "Servers"]
+    deferred = [server for server in dict.fromkeys(deferred) if not run_deferred_server(server)]
+    if len(deferred) > 0:
+        logger.warning("[Servers] Skipped updates for running servers: %s", ', '.join(deferred))
+    rate_budget.report()
+    logger.info("Successfully checkt all Mods and Servers")
+    return True
+
+
+# ========================================================
+# asks whether to try again after exceeding the rate limit
+# ========================================================
+def retry_rate_limit(yamlpath) -> bool:
+    if len(git_token) > 0:
+        target_logger(yamlpath).info(
+            "Available GitHub requests left %s/%s", g.rate_limiting[0], g.rate_limiting[1])
+    download_progress.close()
+    flush_logs()
+    return not stage_updates and "y" == input("Wait and try update again in 60sec? (y/n) ")
+
+
+# ===========================================
+# applies the 'Launcher' config of the client
+# ===========================================
+def apply_launcher_config():
+    section = "Launcher"
+    if config[section].get() is None:
+        target_logger([section]).warning("Skipping Section, config is invalid or is missing subsections")
+        return
+    logger.info("[Config] Applying configurations")
+    logger.debug("[Config] [ns_startup_args.txt] Applying config...")
+
+    replace_str = ""
+    config_list = str(config[section]["arguments"].get(confuse.Optional(str, default=""))).strip() + " "
+    c_dict = {}
+    config_value = ""
+    for c in re.split('([-+])', config_list)[1:]:
+        if c == "+" or c == "-":
+            config_value = c
+            continue
+        config_value += c
+        config_value.strip()
+        split = config_value.split(" ")
+        c_dict[split[0]] = split[1] if len(split[1:-1]) == 1 else " ".join(split[1:-1])
+
+    with open("ns_startup_args.txt", 'r') as replace:
+        while line := replace.readline():
+            line = line.strip()
+            config_value = ""
+            for c in re.split('([-+])', line)[1:]:
+                if c == "+" or c == "-":
+                    config_value = c
+                    continue
+                config_value += c
+                config_value.strip()
+                split = config_value.split(" ")
+                key = split[0]
+                va = split[1] if len(split[1:-1]) == 1 else " ".join(split[1:-1])
+
+                if key in c_dict.keys():
+                    continue
+                replace_str += f"{key} {va} "
+
+    for k, v in c_dict.items():
+        replace_str += f"{k} {v} "
+    replace_str = replace_str.replace("  ", " ").strip()
+
+    # write new config to file
+    with open("ns_startup_args.txt", "w") as replace:
+        replace.write(replace_str)
+
+
+# =============================================
+# checks and prepares the install of one server
+# =============================================
+def prepare_server(server) -> bool:
+    section = "Servers"
+    yamlpath = [section, server]
+    server_path = Path(
+        config[section][server]["dir"].get(confuse.Optional(str, default=f"./Servers/{server}")))
+    pid = running_processes().server_pid(server_path)
+    if pid is not None:
+        target_logger(yamlpath).info("Server is running (pid %s), postponing update", pid)
+        return False
+
+    try:
+        if not server_path.joinpath("Titanfall2.exe").exists():
+            target_logger(yamlpath).warning("Titanfall2 files invalid or don't exists at server location")
+            install_tf2(server_path)
+        if not server_path.joinpath("auto_restart.bat").exists():
+            target_logger(yamlpath).warning("Auto-Restart script not found at server location")
+            with open(server_path.joinpath("auto_restart.bat"), "w") as auto_restart:
+                auto_restart.write('''@echo off 
 echo Starting %1 %2
 goto restart
 
@@ -955,167 +3510,273 @@ echo Server exited with code: %errorlevel%
 
 :exit
 ''')
-                                logger.info(
-                                    f"[{'] ['.join(yamlpath)}] Successfully created auto_restart.bat at server location")
-                        for con in [s for s in config[section][server] if s not in ["enabled"]]:
-                            if con == "Mods":
-                                for mod in config[section][server][con]:
-                                    yamlpath = [section, server, con, mod]
-                                    ModUpdater(yamlpath).run()
-                            elif con == "Config":
-                                logger.info(f"[{'] ['.join(yamlpath)}] Applying configurations")
-                                for file in config[section][server][con]:
-                                    yamlpath = [section, server, con, file]
-                                    logger.debug(f"[{'] ['.join(yamlpath)}] Applying config...")
-                                    if file == "ns_startup_args_dedi.txt":
-                                        x = Path(server_path / file)
-
-                                        replace_str = ""
-                                        config_list = str(config[section][server][con][file].get()).strip() + " "
-                                        c_dict = {}
-                                        config_value = ""
-                                        for c in re.split('([-+])', config_list)[1:]:
-                                            if c == "+" or c == "-":
-                                                config_value = c
-                                                continue
-                                            config_value += c
-                                            config_value.strip()
-                                            split = config_value.split(" ")
-                                            c_dict[split[0]] = split[1] if len(split[1:-1]) == 1 else " ".join(
-                                                split[1:-1])
-
-                                        with open(x, 'r') as replace:
-                                            while line := replace.readline():
-                                                line = line.strip()
-                                                config_value = ""
-                                                for c in re.split('([-+])', line)[1:]:
-                                                    if c == "+" or c == "-":
-                                                        config_value = c
-                                                        continue
-                                                    config_value += c
-                                                    config_value.strip()
-                                                    split = config_value.split(" ")
-                                                    key = split[0]
-                                                    va = split[1] if len(split[1:-1]) == 1 else " ".join(split[1:-1])
-
-                                                    if key in c_dict.keys():
-                                                        continue
-                                                    replace_str += f"{key} {va} "
-
-                                        for k, v in c_dict.items():
-                                            replace_str += f" {k} {v}"
-                                        replace_str = replace_str.replace("  ", " ").strip()
-
-                                        # write new config to file
-                                        with open(x, "w") as replace:
-                                            replace.write(replace_str)
-
-                                    elif file == "mod.json":
-                                        for file_section in config[section][server][con][file]:
-                                            yamlpath = [section, server, con, file, file_section]
-                                            if file_section == "ConVars":
-
-                                                x = Path(
-                                                    server_path / "R2Northstar/mods/Northstar.CustomServers" / file)
-
-                                                config_list = config[section][server][con][file][file_section].get()
-                                                # read config
-                                                with open(x, "r") as j:
-                                                    data = json.load(j)
-
-                                                json_list = list(data["ConVars"])
-                                                remove_list = []
-                                                # search the to replace items
-                                                for j in json_list:
-                                                    for key, value in config_list.items():
-                                                        if j["Name"] == key:
-                                                            remove_list.append(j)
-                                                # remove to replace items
-                                                for j in remove_list:
-                                                    json_list.remove(j)
-                                                # add updated item
-                                                for key, value in config_list.items():
-                                                    json_string = {
-                                                        "Name": key,
-                                                        "DefaultValue": value
-                                                    }
-                                                    json_list.append(json_string)
-                                                # write config
-                                                data["ConVars"] = json_list
-                                                with open(x, "w") as j:
-                                                    json.dump(data, j, indent=4)
-
-                                            else:
-                                                logger.error(f"[{'] ['.join(yamlpath)}] Unknown section {file_section}")
-
-                                    elif file == "autoexec_ns_server.cfg":
-                                        x = Path(
-                                            server_path / "R2Northstar/mods/Northstar.CustomServers/mod/cfg" / file)
-
-                                        replace_str = ""
-                                        config_list = config[section][server][con][file].get().copy()
-
-                                        # search for args that need to be replaced
-                                        with open(x, 'r') as replace:
-                                            while line := replace.readline():
-                                                line = line.strip()
-                                                if not line:  # for blank lines
-                                                    replace_str += "\n"
-                                                    continue
-
-                                                if line.startswith("//"):  # for only comment lines
-                                                    replace_str += line + "\n"
-                                                    continue
-
-                                                comment = line.split(" //")
-                                                line_value = comment[0].split(" ")
-
-                                                found = False
-                                                for key, value in config_list.items():
-                                                    if key == line_value[0]:
-                                                        config_list.pop(key)
-                                                        found = True
-                                                        replace_str += f"{line_value[0]} {value}{'' if len(comment[1:]) == 0 else ' //' + ' '.join(comment[1:])} \n"
-                                                        break
-                                                if not found:
-                                                    replace_str += f"{line_value[0]} {' '.join(line_value[1:])} //{' '.join(comment[1:])}\n"
-
-                                        # add not found args in config file
-                                        for key, value in config_list.items():
-                                            replace_str += f"{key} {value}\n"
-
-                                        # write new config to file
-                                        with open(x, "w") as replace:
-                                            replace.write(replace_str)
-
-                            else:
-                                logger.warning(f"[{'] ['.join(yamlpath)}] Unknown Field {con}")
+                target_logger(yamlpath).info("Successfully created auto_restart.bat at server location")
+    except PermissionError as permission:
+        target_logger(yamlpath).warning("File (%s) is locked, server is still running", Path(permission.filename).name)
+        return False
 
-            else:
-                logger.warning(f"[{'] ['.join(yamlpath)}] Unknown Section {section}")
+    for con in [s for s in config[section][server] if s not in ["enabled", "dir", "Mods", "Config"]]:
+        target_logger(yamlpath).warning("Unknown Field %s", con)
+    return True
 
-        except SectionHasNoSubSections:
-            logger.warning(
-                f"[{'] ['.join(yamlpath)}] Skipping Section, config is invalid or is missing subsections")
-            return True
 
-        except (RateLimitExceededException, ConnectionError):
-            logger.warning(f"[{'] ['.join(yamlpath)}] Rate limit exceeded")
-            if len(git_token) > 0:
-                logger.info(
-                    f"[{'] ['.join(yamlpath)}] Available GitHub requests left {g.rate_limiting[0]}/{g.rate_limiting[1]}")
-            if "y" != input("Wait and try update again in 60sec? (y/n) "):
-                break
-            return False
+# =======================================
+# mods of one server in order of priority
+# =======================================
+def server_mods(server):
+    section, con = "Servers", "Mods"
+    if con not in [s for s in config[section][server]]:
+        return []
+    return rate_budget.order([[section, server, con, mod] for mod in config[section][server][con]
+                              if selected([section, server, con, mod])])
+
+
+# ==================================
+# applies the 'Config' of one server
+# ==================================
+def apply_server_config(server):
+    section, con = "Servers", "Config"
+    yamlpath = [section, server]
+    if con not in [s for s in config[section][server]] or not selected([section, server, con]):
+        return
+    server_path = Path(
+        config[section][server]["dir"].get(confuse.Optional(str, default=f"./Servers/{server}")))
+    target_logger(yamlpath).info("Applying configurations")
+    for file in config[section][server][con]:
+        yamlpath = [section, server, con, file]
+        target_logger(yamlpath).debug("Applying config...")
+        if file == "ns_startup_args_dedi.txt":
+            x = Path(server_path / file)
+
+            replace_str = ""
+            config_list = str(config[section][server][con][file].get()).strip() + " "
+            c_dict = {}
+            config_value = ""
+            for c in re.split('([-+])', config_list)[1:]:
+                if c == "+" or c == "-":
+                    config_value = c
+                    continue
+                config_value += c
+                config_value.strip()
+                split = config_value.split(" ")
+                c_dict[split[0]] = split[1] if len(split[1:-1]) == 1 else " ".join(
+                    split[1:-1])
+
+            with open(x, 'r') as replace:
+                while line := replace.readline():
+                    line = line.strip()
+                    config_value = ""
+                    for c in re.split('([-+])', line)[1:]:
+                        if c == "+" or c == "-":
+                            config_value = c
+                            continue
+                        config_value += c
+                        config_value.strip()
+                        split = config_value.split(" ")
+                        key = split[0]
+                        va = split[1] if len(split[1:-1]) == 1 else " ".join(split[1:-1])
+
+                        if key in c_dict.keys():
+                            continue
+                        replace_str += f"{key} {va} "
+
+            for k, v in c_dict.items():
+                replace_str += f" {k} {v}"
+            replace_str = replace_str.replace("  ", " ").strip()
+
+            # write new config to file
+            with open(x, "w") as replace:
+                replace.write(replace_str)
+
+        elif file == "mod.json":
+            for file_section in config[section][server][con][file]:
+                yamlpath = [section, server, con, file, file_section]
+                if file_section == "ConVars":
+
+                    x = Path(
+                        server_path / "R2Northstar/mods/Northstar.CustomServers" / file)
+
+                    config_list = config[section][server][con][file][file_section].get()
+                    # read config
+                    with open(x, "r") as j:
+                        data = json.load(j)
+
+                    json_list = list(data["ConVars"])
+                    remove_list = []
+                    # search the to replace items
+                    for j in json_list:
+                        for key, value in config_list.items():
+                            if j["Name"] == key:
+                                remove_list.append(j)
+                    # remove to replace items
+                    for j in remove_list:
+                        json_list.remove(j)
+                    # add updated item
+                    for key, value in config_list.items():
+                        json_string = {
+                            "Name": key,
+                            "DefaultValue": value
+                        }
+                        json_list.append(json_string)
+                    # write config
+                    data["ConVars"] = json_list
+                    with open(x, "w") as j:
+                        json.dump(data, j, indent=4)
 
-        except FileNotInZip:
-            logger.warning(f"[{'] ['.join(yamlpath)}] Zip file for doesn't contain expected files")
+                else:
+                    target_logger(yamlpath).error("Unknown section %s", file_section)
+
+        elif file == "autoexec_ns_server.cfg":
+            x = Path(
+                server_path / "R2Northstar/mods/Northstar.CustomServers/mod/cfg" / file)
+
+            replace_str = ""
+            config_list = config[section][server][con][file].get().copy()
+
+            # search for args that need to be replaced
+            with open(x, 'r') as replace:
+                while line := replace.readline():
+                    line = line.strip()
+                    if not line:  # for blank lines
+                        replace_str += "\n"
+                        continue
+
+                    if line.startswith("//"):  # for only comment lines
+                        replace_str += line + "\n"
+                        continue
+
+                    comment = line.split(" //")
+                    line_value = comment[0].split(" ")
+
+                    found = False
+                    for key, value in config_list.items():
+                        if key == line_value[0]:
+                            config_list.pop(key)
+                            found = True
+                            replace_str += f"{line_value[0]} {value}{'' if len(comment[1:]) == 0 else ' //' + ' '.join(comment[1:])} \n"
+                            break
+                    if not found:
+                        replace_str += f"{line_value[0]} {' '.join(line_value[1:])} //{' '.join(comment[1:])}\n"
+
+            # add not found args in config file
+            for key, value in config_list.items():
+                replace_str += f"{key} {value}\n"
+
+            # write new config to file
+            with open(x, "w") as replace:
+                replace.write(replace_str)
+
+
+# =====================================================
+# updates the mods and applies the config of one server
+# =====================================================
+def update_server(server) -> bool:
+    if not prepare_server(server):
+        return False
+    pipeline = Pipeline()
+    pipeline.add(("Servers", server), server_mods(server), lambda: apply_server_config(server))
+    pipeline.run()
+    return len(pipeline.locked) == 0
+
+
+# ========================================================
+# retries a deferred server depending on its 'on_running'
+# ========================================================
+def run_deferred_server(server) -> bool:
+    on_running = str(config["Servers"]["on_running"].get(confuse.Optional(str, default="defer"))).lower()
+    if on_running == "skip":
+        return False
+
+    running_processes(rescan=True)
+    if update_server(server):
+        return True
+    while on_running == "queue":
+        logger.info("[Servers] [%s] Waiting for server to stop, re-checking in 10s...", server)
+        time.sleep(10)
+        running_processes(rescan=True)
+        if update_server(server):
             return True
-        except FileNotFoundError as file_not_found:
-            logger.error(f"[{'] ['.join(yamlpath)}] File ({Path(file_not_found.filename).name}) does not exist")
-            exit(1)
-    logger.info(f"Successfully checkt all Mods and Servers")
-    return True
+    return False
+
+
+# ================================================
+# restores the previous kept version of one repo
+# ================================================
+def rollback(target) -> bool:
+    for yamlpath in config_targets(manager=False):
+        if "/".join(yamlpath).lower() == target.strip("/").lower():
+            return ModUpdater(yamlpath).rollback()
+    logger.error("[Rollback] %s is not a repo of the 'manager_config.yaml', expected eg. Mods/Northstar", target)
+    return False
+
+
+# ===========================================
+# verifies/ repairs the files of all mods
+# ===========================================
+def verify() -> bool:
+    valid = True
+    unverifiable = []
+    skipped = []  # installs of an unknown release, eg. migrated from 'last_update'
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        for yamlpath in [yamlpath for yamlpath in config_targets(manager=False) if selected(yamlpath)]:
+            updater = ModUpdater(yamlpath)
+            if not updater.file.exists():
+                target_logger(yamlpath).info("Not installed, skipping verification")
+                continue
+            try:
+                valid = updater.verify(pool, repairFiles) and valid
+            except UnknownInstall:
+                target_logger(yamlpath).warning("Installed release is unknown, skipped. Run -updateAll to reinstall %s",
+                                                yamlpath[-1])
+                skipped.append("/".join(yamlpath))
+            except NoValidRelease as unknown:
+                target_logger(yamlpath).warning("%s, run -updateAll to reinstall %s", unknown, yamlpath[-1])
+                valid = False
+            except FileNotInZip:
+                target_logger(yamlpath).warning("Zip file for doesn't contain expected files")
+                valid = False
+            except DownloadError as invalid:
+                target_logger(yamlpath).warning("%s", invalid)
+                valid = False
+            except (requests.exceptions.RequestException, GithubException) as error:
+                # offline or rate limited, the other targets are still verified
+                target_logger(yamlpath).warning("Unverifiable, couldn't reach the source of the release: %s", error)
+                unverifiable.append("/".join(yamlpath))
+    logger.info("Verification %s", 'successful' if valid else 'found damaged files')
+    if len(skipped) > 0:
+        logger.warning("Verification skipped (unknown release): %s", ", ".join(skipped))
+    if len(unverifiable) > 0:
+        logger.warning("Verification couldn't check (unverifiable): %s", ", ".join(unverifiable))
+    return valid and len(unverifiable) == 0
+
+
+# ===============================================
+# benchmarks zipfile against MappedArchive extract
+# ===============================================
+def benchmark_extract(path: Path):
+    with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as mapped_dir:
+        started = time.perf_counter()
+        with zipfile.ZipFile(path) as zip_:
+            for fileinfo in zip_.infolist():
+                zip_.extract(fileinfo, legacy_dir)
+            # synced like the parallel extraction, so both include the flush
+            sync_files([Path(legacy_dir, fileinfo.filename) for fileinfo in zip_.infolist()])
+        legacy = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with open(path, "rb") as file:
+            archive = MappedArchive(file)
+            try:
+                infos = [info for info in archive.zip.infolist() if not info.is_dir()]
+                archive.extract_all([(info, Path(mapped_dir, info.filename)) for info in infos], extract_workers)
+            finally:
+                archive.close()
+        mapped = time.perf_counter() - started
+
+    size = sum(info.file_size for info in infos) / 1024 / 1024
+    logger.info("[Benchmark] %s: %s files, %.1f MB uncompressed", path.name, len(infos), size)
+    logger.info("[Benchmark] zipfile.extract ........ %.3fs", legacy)
+    logger.info("[Benchmark] parallel (%s threads) . %.3fs (%.2fx)", extract_workers, mapped, legacy / mapped)
 
 
 # =============================
@@ -1125,51 +3786,363 @@ def launcher():
     script = f'"{config["Launcher"]["filename"].get()}"{(" " + " ".join(sysargs[1::])) if len(sysargs) > 1 else ""}{" -" + loglevel[0] if len(loglevel) > 0 else ""}'
     pre_launch_origin()
     try:
-        logger.info(f"[Launcher] Launching {script}")
-        subprocess.Popen(script, cwd=str(Path.cwd()), shell=True)
+        logger.info("[Launcher] Launching %s", script)
+        return subprocess.Popen(script, cwd=str(Path.cwd()), shell=True)
     except FileNotFoundError:
-        logger.error(f"[Launcher] Could not find given file {script}")
+        logger.error("[Launcher] Could not find given file %s", script)
         exit(1)
 
 
+# ======================================
+# checks if the game is currently running
+# ======================================
+def game_running(rescan=True) -> bool:
+    processes = running_processes(rescan=rescan)
+    return processes.has_name(Path(config["Launcher"]["filename"].get()).name) or processes.has_name("Titanfall2.exe")
+
+# =========================================================================
+# moves the staged units of a journaled swap into place, also after a crash
+# =========================================================================
+def complete_swap(target, journal):
+    install_dir, staging, backup = Path(journal["install_dir"]), Path(journal["staging"]), Path(journal["backup"])
+    for unit in journal["units"]:
+        if not staging.joinpath(unit).exists():
+            continue  # moved into place before the interruption
+        if install_dir.joinpath(unit).exists():
+            if backup.joinpath(unit).exists():
+                # the installed unit was kept already, this one got created after the interruption
+                if install_dir.joinpath(unit).is_dir():
+                    shutil.rmtree(install_dir.joinpath(unit))
+                else:
+                    install_dir.joinpath(unit).unlink()
+            else:
+                backup.joinpath(unit).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(install_dir.joinpath(unit), backup.joinpath(unit))
+        install_dir.joinpath(unit).parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staging.joinpath(unit), install_dir.joinpath(unit))
+    target_logger(target.split("/")).debug("Swapped %s files and folders into %s", len(journal["units"]), install_dir)
+    state.finish_swap(target, journal, backup.exists())
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def recover_swaps():
+    for target, journal in state.swaps():
+        target_logger(target.split("/")).warning("Finishing the swap to %s which got interrupted", journal["tag"])
+        complete_swap(target, journal)
+
+
+# =======================================================
+# swaps in the client updates staged while the game ran
+# =======================================================
+def apply_pending():
+    targets = ["/".join(yamlpath) for yamlpath in config_targets(manager=False)]
+    for pending in state.pending():
+        staging = Path(pending["staging"])
+        if pending["target"] not in targets or not staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+            state.remove_pending(pending["target"])
+            continue
+        updater = ModUpdater(pending["target"].split("/"))
+        updater.swap(staging, json.loads(pending["units"]), pending["tag"],
+                     datetime.fromisoformat(pending["published_at"]), pending["asset_hash"],
+                     json.loads(pending["manifest"]))
+        state.remove_pending(updater.target)
+        updater.log.info("Applied staged update to %s", pending['tag'])
+
+
+# ==============================================
+# launches the game and updates in the background
+# ==============================================
+def launch_first():
+    global stage_updates
+    stage_updates = True
+    game = launcher()
+    updater()
+    download_progress.close()
+    if fleet is not None:
+        fleet.close()
+    if launchServers:
+        launchservers()
+
+    if len(state.pending()) == 0:
+        return
+    logger.info("[Launcher] Waiting for the game to exit to apply the staged updates...")
+    flush_logs()
+    game.wait()
+    while game_running():
+        time.sleep(5)
+    apply_pending()
+
+
 # ==================
 # prelaunches origin
 # ==================
 def pre_launch_origin():
     script = "C:/Program Files (x86)/Origin/Origin.exe"
     try:
-        if "Origin.exe" not in (p.name() for p in psutil.process_iter()):
-            logger.info(f"[Launcher] Launching Origin and waiting 10sec...")
+        if not running_processes().has_name("Origin.exe"):
+            timeout = config["Global"]["origin_timeout"].get(confuse.Optional(int, default=10))
+            logger.info("[Launcher] Launching Origin and waiting up to %ssec...", timeout)
             subprocess.Popen(script, cwd=str(Path.cwd()), shell=True)
-            time.sleep(10)
-            logger.info(f"[Launcher] Launched  Origin succesfull")
+            # polls the running processes instead of always waiting the whole timeout
+            waited = time.monotonic()
+            while not running_processes(rescan=True).has_name("Origin.exe") and \
+                    time.monotonic() - waited < timeout:
+                time.sleep(0.5)
+            logger.info("[Launcher] Launched  Origin succesfull")
 
     except FileNotFoundError:
-        logger.error(f"[Launcher] Could not find given file {script}")
+        logger.error("[Launcher] Could not find given file %s", script)
         exit(1)
 
 
+# ===================================================
+# Change events of files in dirs, inotify Linux only
+# ===================================================
+class Inotify:
+    events = 0x2 | 0x8 | 0x80 | 0x100 | 0x200  # IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE, IN_DELETE
+
+    def __init__(self):
+        self.libc = None
+        self.fd = -1
+        self.watched = {}  # dir -> watch descriptor
+        self.dirs = {}  # watch descriptor -> dir
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+                fd = libc.inotify_init1(os.O_CLOEXEC)
+                if fd >= 0:
+                    self.libc, self.fd = libc, fd
+            except (OSError, AttributeError):
+                pass
+
+    @property
+    def available(self) -> bool:
+        return self.fd >= 0
+
+    def add(self, directory: Path) -> bool:
+        if not self.available or directory in self.watched:
+            return directory in self.watched
+        if not directory.is_dir():
+            return False
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.events)
+        if wd < 0:
+            return False
+        self.watched[directory] = wd
+        self.dirs[wd] = directory
+        return True
+
+    def read(self, timeout) -> list:
+        # dir and name of the changed files, waits up to timeout seconds, forever for None
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if len(readable) == 0:
+            return []
+        data = os.read(self.fd, 65536)
+        changed = []
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, _, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0").decode(errors="replace")
+            if wd in self.dirs and name:
+                changed.append((self.dirs[wd], name))
+            offset += 16 + length
+        return changed
+
+    def close(self):
+        if self.available:
+            os.close(self.fd)
+            self.fd = -1
+
+
+# ================================================
+# Collects the output and log files of the servers
+# ================================================
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    # lines get written in blocks instead of one by one, the aggregator syncs once it's idle
+    def flush(self):
+        pass
+
+    def sync(self):
+        super().flush()
+
+
+class LogAggregator:
+    def __init__(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        max_bytes = config["Global"]["server_log_max_mb"].get(confuse.Optional(int, default=10)) * 1024 * 1024
+        backups = config["Global"]["server_log_backups"].get(confuse.Optional(int, default=5))
+        text = BufferedRotatingFileHandler(
+            directory / "servers.log", maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        text.setFormatter(TargetFormatter("[%(asctime)s] %(target)s[%(source)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
+        self.handlers = [text]
+        if config["Global"]["server_log_json"].get(confuse.Optional(bool, default=False)):
+            jsonl = BufferedRotatingFileHandler(
+                directory / "servers.jsonl", maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            jsonl.setFormatter(JsonFormatter())
+            self.handlers.append(jsonl)
+
+        self.directory = directory
+        self.queue = queue.SimpleQueue()
+        self.processes = {}  # server -> process launched by the manager
+        self.logs = {}  # logs dir of Northstar -> server
+        self.offsets = {}  # log file -> bytes already collected
+        self.inotify = Inotify()
+        self.closed = threading.Event()
+        self.launched = threading.Event()
+        self.writer = threading.Thread(target=self.write, name="server logs", daemon=True)
+        self.writer.start()
+        threading.Thread(target=self.tail, name="server log files", daemon=True).start()
+
+    def line(self, server, source, message):
+        self.queue.put(logging.makeLogRecord({
+            "msg": message, "levelname": "INFO", "levelno": logging.INFO, "yamlpath": ("Servers", server),
+            "source": source}))
+
+    def write(self):
+        # the only thread writing the files, the servers never wait for the disk
+        while True:
+            try:
+                record = self.queue.get(timeout=1)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.sync()
+                continue
+            if record is None:
+                break
+            for handler in self.handlers:
+                handler.handle(record)
+        for handler in self.handlers:
+            handler.close()
+
+    def launch(self, servers):
+        # starts the servers in an intervall of 10 seconds, without a window and with their output piped
+        def run():
+            for number, (server, server_dir) in enumerate(servers):
+                if number > 0 and self.closed.wait(10):
+                    break
+                command = ["cmd.exe", "/c", "auto_restart.bat", "NorthstarLauncher.exe", "-dedicated"]
+                try:
+                    process = subprocess.Popen(
+                        command, cwd=server_dir, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT, creationflags=getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0))
+                except OSError as error:
+                    logger.error("[Launcher] Server: %s could not be launched: %s", server, error)
+                    continue
+                logger.info("[Launcher] Launched server: %s (pid %s)", server, process.pid)
+                self.processes[server] = process
+                threading.Thread(target=self.read_pipe, args=(server, process), name=f"server {server}",
+                                 daemon=True).start()
+            self.launched.set()
+
+        threading.Thread(target=run, name="server launcher", daemon=True).start()
+
+    def read_pipe(self, server, process):
+        for raw in process.stdout:
+            self.line(server, "stdout", raw.decode(errors="replace").rstrip())
+        self.line(server, "manager", f"Server exited with code {process.wait()}")
+
+    def add_logs(self, server, directory: Path):
+        # log files which already exist are only collected from their current end
+        directory = directory.resolve()
+        self.logs[directory] = server
+        for file in directory.glob("*.txt") if directory.is_dir() else []:
+            self.offsets[file] = file.stat().st_size
+        self.inotify.add(directory)
+
+    def tail(self):
+        while not self.closed.is_set():
+            if self.inotify.available:
+                # dirs which don't exist yet get created by Northstar on its first start
+                added = [directory for directory in list(self.logs)
+                         if directory not in self.inotify.watched and self.inotify.add(directory)]
+                # lines written before the dir got watched
+                changed = [file for directory in added for file in directory.glob("*.txt")]
+                changed += [directory / name for directory, name in self.inotify.read(1)]
+            else:
+                time.sleep(1)
+                changed = [file for directory in list(self.logs) if directory.is_dir()
+                           for file in directory.glob("*.txt")]
+            for file in dict.fromkeys(changed):
+                self.read_file(file)
+
+    def read_file(self, file: Path):
+        server = self.logs.get(file.parent)
+        if server is None or file.suffix.lower() != ".txt":
+            return
+        offset = self.offsets.get(file, 0)
+        try:
+            if file.stat().st_size < offset:  # truncated
+                offset = 0
+            with open(file, "rb") as log:
+                log.seek(offset)
+                data = log.read()
+        except OSError:
+            return
+        # a line without its line break gets collected with the next write
+        end = data.rfind(b"\n") + 1
+        for raw in data[:end].splitlines():
+            self.line(server, file.name, raw.decode(errors="replace").rstrip())
+        self.offsets[file] = offset + end
+
+    def wait(self):
+        # until all launched servers exited or Ctrl+C, the servers keep running after that
+        logger.info("[Logs] Collecting the output of the servers in '%s', stop with Ctrl+C", self.directory)
+        flush_logs()
+        try:
+            # returns right away if every launch failed
+            while not (self.launched.wait(1) and
+                       all(process.poll() is not None for process in self.processes.values())):
+                pass
+        except KeyboardInterrupt:
+            pass
+
+    def close(self):
+        self.closed.set()
+        self.queue.put(None)
+        self.writer.join()
+        self.inotify.close()
+
+
 # ============================
 # launches all enabled servers
 # ============================
 def launchservers():
+    global server_logs
     scripts = []
+    servers = []
+    logs = []  # logs dir of every enabled server, including the running ones
+    log_dir = config["Global"]["server_log_dir"].get(confuse.Optional(str, default=""))
 
     if not config["Servers"]["enabled"].get(confuse.Optional(bool, default=True)):
-        logger.info(f"[Launcher] All servers are disabled")
+        logger.info("[Launcher] All servers are disabled")
         return
     for server in config["Servers"]:
-        if server != "enabled":
+        if server not in ["enabled", "on_running"]:
             if not config["Servers"][server]["enabled"].get(confuse.Optional(bool, default=True)):
-                logger.info(f"[Launcher] Server: {server} is disabled")
+                logger.info("[Launcher] Server: %s is disabled", server)
                 continue
             else:
                 server_dir = config["Servers"][server]["dir"].get(confuse.Optional(str, f"Servers/{server}"))
+                logs.append((server, Path(server_dir) / "R2Northstar/logs"))
+                pid = running_processes().server_pid(Path(server_dir))
+                if pid is not None:
+                    logger.info("[Launcher] Server: %s is already running (pid %s)", server, pid)
+                    continue
+                servers.append((server, server_dir))
                 scripts.append(
                     f'start cmd.exe /c "cd /d {server_dir} && auto_restart.bat NorthstarLauncher.exe -dedicated"')
 
     if len(scripts) == 0:
-        logger.warning(f"[Launcher] No enabled Servers found")
+        logger.warning("[Launcher] No enabled Servers found")
+        return
+
+    # the output of the servers gets collected instead of one window per server
+    if len(log_dir) > 0:
+        server_logs = LogAggregator(Path(log_dir))
+        for server, directory in logs:
+            server_logs.add_logs(server, directory)
+        logger.info("[Launcher] Launching servers in an intervall of 10 seconds")
+        server_logs.launch(servers)
         return
 
     # Add a pause in between launching servers
@@ -1178,10 +4151,164 @@ def launchservers():
     subprocess.Popen(scripts, cwd=str(Path.cwd()), shell=True)
 
 
-main()
+
+# ===================================================
+# Watches the config files, with inotify or polling
+# ===================================================
+def config_files():
+    # 'manager_config.yaml' and the include files of the Servers, the dirs where new include files can appear
+    files = [Path("manager_config.yaml")]
+    dirs = {Path(".")}
+    patterns = config["Include"]["Servers"].get() if config["Include"]["Servers"].exists() else []
+    for pattern in [patterns] if isinstance(patterns, str) else list(patterns or []):
+        files += sorted(Path(file) for file in glob.glob(pattern))
+        dirs |= {parent for parent in [Path(pattern).parent] if not glob.has_magic(str(parent))}
+    return files, dirs | {file.parent for file in files}
+
+
+class ConfigWatcher:
+    def __init__(self, poll_interval=1.0):
+        self.poll_interval = poll_interval
+        self.inotify = Inotify()
+        self.stamps = self.stat()
+        self.refresh()
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self.inotify.available else "polling"
+
+    @staticmethod
+    def stat():
+        stamps = {}
+        for file in config_files()[0]:
+            try:
+                stat = file.stat()
+                stamps[file] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamps[file] = None
+        return stamps
+
+    def refresh(self):
+        # an edited include can match files in other dirs
+        if not self.inotify.available:
+            self.stamps = self.stat()
+            return
+        for directory in config_files()[1]:
+            self.inotify.add(directory.resolve())
+
+    def changed(self, timeout) -> bool:
+        # waits up to timeout seconds, forever for None
+        if not self.inotify.available:
+            time.sleep(self.poll_interval if timeout is None else timeout)
+            stamps = self.stat()
+            changed, self.stamps = stamps != self.stamps, stamps
+            return changed
+        return any(name.lower().endswith((".yaml", ".yml")) for _, name in self.inotify.read(timeout))
+
+    def wait(self, debounce):
+        # returns once the files changed and then stayed unchanged for debounce seconds, editors write in bursts
+        while not self.changed(None):
+            pass
+        while self.changed(debounce):
+            pass
+
+    def close(self):
+        self.inotify.close()
+
+
+# ====================================================
+# Reloads the config and re-applies the changed servers
+# ====================================================
+def reload_config() -> bool:
+    if not Path("manager_config.yaml").exists():
+        logger.warning("[Watch] 'manager_config.yaml' does not exist, keeping the previous config")
+        return False
+    data = read_config(Path("manager_config.yaml"), strict=False)
+    if not isinstance(data, dict):
+        logger.warning("[Watch] 'manager_config.yaml' is invalid, keeping the previous config")
+        return False
+    config.sources[:] = config_base
+    config.set(data)
+    load_includes(["Servers"], strict=False)
+    return True
+
+
+def server_configs() -> dict:
+    servers = config["Servers"].flatten() if config["Servers"].exists() else {}
+    return {server: values.get("Config") for server, values in servers.items()
+            if server not in ["enabled", "on_running"] and isinstance(values, dict)}
+
+
+def watch():
+    restart = config["Global"]["watch_restart"].get(confuse.Optional(bool, default=False))
+    debounce = config["Global"]["watch_debounce_ms"].get(confuse.Optional(int, default=500)) / 1000
+    watcher = ConfigWatcher()
+    logger.info("[Watch] Watching the config files (%s), stop with Ctrl+C", watcher.mode)
+    flush_logs()
+    try:
+        while True:
+            watcher.wait(debounce)
+            before = server_configs()
+            if not reload_config():
+                continue
+            watcher.refresh()
+            after = server_configs()
+            changed = [server for server in after if after[server] != before.get(server) and selected(["Servers", server])]
+            if len(changed) == 0:
+                logger.info("[Watch] Config files changed, no Config of a server changed")
+                continue
+
+            running_processes(rescan=True)
+            for server in changed:
+                reapply_server_config(server, restart)
+            flush_logs()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def reapply_server_config(server, restart):
+    yamlpath = ["Servers", server]
+    if not config["Servers"][server]["enabled"].get(confuse.Optional(bool, default=True)):
+        target_logger(yamlpath).info("Server is disabled, skipping its changed config")
+        return
+    try:
+        apply_server_config(server)
+    except PermissionError as permission:
+        target_logger(yamlpath).warning("File (%s) is locked, server is still running", Path(permission.filename).name)
+        return
+    except FileNotFoundError as file_not_found:
+        target_logger(yamlpath).error("File (%s) does not exist", Path(file_not_found.filename).name)
+        return
+    target_logger(yamlpath).info("Re-applied the changed config")
+
+    server_path = Path(config["Servers"][server]["dir"].get(confuse.Optional(str, default=f"./Servers/{server}")))
+    pid = running_processes().server_pid(server_path)
+    if pid is None:
+        return
+    if not restart:
+        target_logger(yamlpath).info("Server is running (pid %s), the config gets used on its next start", pid)
+        return
+    # auto_restart.bat starts the server again once it exited with an error code
+    try:
+        psutil.Process(pid).terminate()
+        target_logger(yamlpath).info("Restarting the server (pid %s) with the changed config", pid)
+    except psutil.Error as error:
+        target_logger(yamlpath).warning("Could not restart the server (pid %s): %s", pid, error)
+
+
 # ============
 # write config
 # ============
-with open("manager_config.yaml", "w+") as f:
-    logger.debug(f"Writing config to {f.name}")
-    yaml.dump(conf_comments, f)
+def write_config():
+    # an existing config is only read, the default config gets written once
+    if conf_comments is None:
+        return
+    with open("manager_config.yaml", "w+") as f:
+        logger.debug("Writing config to %s", f.name)
+        yaml.dump(conf_comments, f)
+
+
+main()
+write_config()